@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
 import os
+import shutil
+import sys
 import time
 import threading
+from dataclasses import dataclass, field
+from pathlib import Path
 from queue import Queue, Empty
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import cv2
 import httpx
+import numpy as np
 import torch
 from ultralytics import YOLO
 
@@ -40,15 +48,138 @@ COLORS = {
 
 SEND_INTERVAL_SEC = 1.0
 
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# "pt" — исходные веса; остальное — форматы ultralytics export,
+# готовый артефакт кешируется на диске и переиспользуется между запусками.
+BACKENDS = ("pt", "torchscript", "onnx", "openvino", "engine")
+MODEL_CACHE_DIR = os.getenv("ASFES_MODEL_CACHE", str(Path.home() / ".cache" / "asfes-camera"))
+WARMUP_RUNS = 2
+
+STARTED_AT = time.perf_counter()
+
+
+@dataclass
+class StreamConfig:
+    name: str
+    url: str
+    company: str
+    warehouse_id: str
+    api_key: str
+
+
+@dataclass
+class CameraConfig:
+    server: str = SERVER
+    model: str = MODEL_PATH
+    imgsz: int = IMGSZ
+    conf: float = CONF
+    iou: float = IOU
+    send_interval_sec: float = SEND_INTERVAL_SEC
+    show: bool = True
+    backend: str = "pt"
+    model_cache_dir: str = MODEL_CACHE_DIR
+    warmup_runs: int = WARMUP_RUNS
+    # адаптивный режим включается, если задана хотя бы одна цель
+    target_cpu: Optional[float] = None
+    latency_budget_ms: Optional[float] = None
+    min_imgsz: int = 320
+    max_infer_interval_sec: float = 1.0
+    streams: List[StreamConfig] = field(default_factory=list)
+
+    @property
+    def endpoint(self) -> str:
+        return f"{self.server.rstrip('/')}/camera"
+
+
+def default_config() -> CameraConfig:
+    """Один поток из констант модуля — поведение до появления конфиг-файла."""
+    return CameraConfig(
+        streams=[
+            StreamConfig(
+                name="camera",
+                url=RTSP_URL,
+                company=ORG_NAME,
+                warehouse_id=WAREHOUSE_ID,
+                api_key=CAMERA_API_KEY,
+            )
+        ]
+    )
+
+
+def load_config(path: str) -> CameraConfig:
+    """
+    Читает JSON со списком потоков (пример — ai/cameras.example.json).
+    Общие параметры модели задаются один раз, у каждого потока свои
+    склад и api-ключ.
+    """
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+
+    streams: List[StreamConfig] = []
+    for i, s in enumerate(raw.get("streams") or []):
+        missing = [k for k in ("url", "company", "warehouse_id", "api_key") if not s.get(k)]
+        if missing:
+            raise ValueError(f"streams[{i}]: не заданы поля {', '.join(missing)}")
+        streams.append(
+            StreamConfig(
+                name=str(s.get("name") or f"camera-{i + 1}"),
+                url=s["url"],
+                company=s["company"],
+                warehouse_id=s["warehouse_id"],
+                api_key=s["api_key"],
+            )
+        )
+
+    if not streams:
+        raise ValueError(f"{path}: список streams пуст")
+
+    backend = raw.get("backend", "pt")
+    if backend not in BACKENDS:
+        raise ValueError(f"{path}: backend должен быть одним из {', '.join(BACKENDS)}")
+
+    adaptive = raw.get("adaptive") or {}
+
+    names = [s.name for s in streams]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{path}: имена потоков должны быть уникальными")
+
+    return CameraConfig(
+        server=raw.get("server", SERVER),
+        model=raw.get("model", MODEL_PATH),
+        imgsz=int(raw.get("imgsz", IMGSZ)),
+        conf=float(raw.get("conf", CONF)),
+        iou=float(raw.get("iou", IOU)),
+        send_interval_sec=float(raw.get("send_interval_sec", SEND_INTERVAL_SEC)),
+        show=bool(raw.get("show", True)),
+        backend=backend,
+        model_cache_dir=raw.get("model_cache_dir", MODEL_CACHE_DIR),
+        warmup_runs=int(raw.get("warmup_runs", WARMUP_RUNS)),
+        target_cpu=adaptive.get("target_cpu"),
+        latency_budget_ms=adaptive.get("latency_budget_ms"),
+        min_imgsz=int(adaptive.get("min_imgsz", 320)),
+        max_infer_interval_sec=float(adaptive.get("max_infer_interval_sec", 1.0)),
+        streams=streams,
+    )
+
 
 class CountsPoster(threading.Thread):
-    def __init__(self, queue: Queue, interval_sec: float, endpoint: str):
+    def __init__(
+        self,
+        queue: Queue,
+        interval_sec: float,
+        endpoint: str,
+        auth: Dict[str, str],
+        meta_fn: Optional[Callable[[], Dict]] = None,
+    ):
         super().__init__(daemon=True)
         self.queue = queue
         self.interval_sec = interval_sec
         self.endpoint = endpoint
+        self.auth = auth
+        self.meta_fn = meta_fn
         self._stop = threading.Event()
         self._latest_counts: Dict[str, int] = {}
+        self._posted = False
 
     def stop(self):
         self._stop.set()
@@ -68,27 +199,29 @@ class CountsPoster(threading.Thread):
                     last_send = now
                     try:
                         payload = self._build_request(self._latest_counts)
-                        client.post(self.endpoint, json=payload)
+                        resp = client.post(self.endpoint, json=payload)
+                        if not self._posted and resp.status_code < 400:
+                            self._posted = True
+                            log_startup(f"first counts posted ({self.auth['warehouse_id']})")
                     except Exception as e:
-                        print("[API ERROR]", repr(e))
+                        print(f"[API ERROR] {self.auth['warehouse_id']}:", repr(e))
 
                 time.sleep(0.05)
 
-    @staticmethod
-    def _build_request(counts: Dict[str, int]) -> Dict:
+    def _build_request(self, counts: Dict[str, int]) -> Dict:
         detect_list = []
         for coco_name, count in counts.items():
             if count <= 0:
                 continue
             detect_list.append({"type": coco_name, "count": int(count)})
 
+        payload: Dict = {"detect": detect_list}
+        if self.meta_fn is not None:
+            payload["meta"] = self.meta_fn()
+
         return {
-            "auth": {
-                "company": ORG_NAME,
-                "warehouse_id": WAREHOUSE_ID,
-                "api_key": CAMERA_API_KEY,
-            },
-            "payload": {"detect": detect_list},
+            "auth": dict(self.auth),
+            "payload": payload,
         }
 
 
@@ -98,11 +231,13 @@ class RTSPGrabber(threading.Thread):
     Если инференс тормозит — старые кадры не копятся.
     """
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, name: str = "camera"):
         super().__init__(daemon=True)
         self.url = url
+        self.name = name
         self.cap: Optional[cv2.VideoCapture] = None
         self.last_frame: Optional[any] = None
+        self.frame_id = 0
         self.lock = threading.Lock()
         self._stop = threading.Event()
         self.fails = 0
@@ -123,7 +258,7 @@ class RTSPGrabber(threading.Thread):
     def run(self):
         self.cap = self._open()
         if not self.cap.isOpened():
-            print("[RTSP] cannot open stream")
+            print(f"[RTSP] {self.name}: cannot open stream")
             return
 
         while not self._stop.is_set():
@@ -131,7 +266,7 @@ class RTSPGrabber(threading.Thread):
             if not ok:
                 self.fails += 1
                 if self.fails > 30:
-                    print("[RTSP] reconnecting...")
+                    print(f"[RTSP] {self.name}: reconnecting...")
                     try:
                         self.cap.release()
                     except Exception:
@@ -148,6 +283,9 @@ class RTSPGrabber(threading.Thread):
 
             with self.lock:
                 self.last_frame = frame
+                self.frame_id += 1
+                if self.frame_id == 1:
+                    log_startup(f"{self.name}: first frame")
 
         try:
             self.cap.release()
@@ -160,11 +298,325 @@ class RTSPGrabber(threading.Thread):
                 return None
             return self.last_frame.copy()
 
+    def get_latest_since(self, seen_id: int) -> Tuple[int, Optional[any]]:
+        """Кадр отдаётся, только если он новее seen_id — один кадр не инферится дважды."""
+        with self.lock:
+            if self.last_frame is None or self.frame_id == seen_id:
+                return seen_id, None
+            return self.frame_id, self.last_frame.copy()
+
+
+class StreamWorker:
+    """Связка одного потока: RTSP-читалка, очередь счётчиков и отправщик в API."""
+
+    def __init__(self, stream: StreamConfig, cfg: CameraConfig, meta_fn: Optional[Callable[[], Dict]] = None):
+        self.stream = stream
+        self.window = f"ASFES Camera Client: {stream.name}"
+        self.grabber = RTSPGrabber(stream.url, stream.name)
+        self.queue: Queue = Queue(maxsize=1)
+        self.poster = CountsPoster(
+            self.queue,
+            cfg.send_interval_sec,
+            cfg.endpoint,
+            {
+                "company": stream.company,
+                "warehouse_id": stream.warehouse_id,
+                "api_key": stream.api_key,
+            },
+            meta_fn,
+        )
+        self.seen_id = 0
+        self.last_t = time.time()
+        self.fps_ema = 0.0
+
+    def start(self):
+        self.grabber.start()
+        self.poster.start()
+
+    def stop(self):
+        self.grabber.stop()
+        self.poster.stop()
+
+    def push_counts(self, counts: Dict[str, int]):
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except Empty:
+                pass
+        self.queue.put_nowait(counts)
+
+    def tick_fps(self, alpha: float = 0.1) -> float:
+        new_t = time.time()
+        dt = new_t - self.last_t
+        self.last_t = new_t
+        inst_fps = (1.0 / dt) if dt > 1e-6 else 0.0
+        self.fps_ema = inst_fps if self.fps_ema == 0.0 else (self.fps_ema * (1 - alpha) + inst_fps * alpha)
+        return self.fps_ema
+
+
+class AdaptiveController:
+    """
+    Подбирает рабочую точку (imgsz, пауза между инференсами) под цель по доле CPU
+    и/или бюджету задержки. Точки упорядочены от полного качества к самой дешёвой;
+    при перегрузке контроллер сдвигается на шаг вниз, при запасе — обратно вверх.
+    """
+
+    INTERVALS = (0.0, 0.1, 0.25, 0.5, 1.0, 2.0)
+    HEADROOM = 0.6
+
+    def __init__(
+        self,
+        imgsz: int,
+        *,
+        target_cpu: Optional[float] = None,
+        latency_budget_ms: Optional[float] = None,
+        min_imgsz: int = 320,
+        max_interval_sec: float = 1.0,
+        allow_resize: bool = True,
+        window_sec: float = 2.0,
+    ):
+        self.target_cpu = target_cpu
+        self.latency_budget_ms = latency_budget_ms
+        self.enabled = bool(target_cpu or latency_budget_ms)
+        self.window_sec = window_sec
+        self.points = self._build_points(imgsz, min_imgsz, max_interval_sec, allow_resize)
+        self.level = 0
+
+        self._cpus = os.cpu_count() or 1
+        self._win_t0 = time.perf_counter()
+        self._win_cpu0 = time.process_time()
+        self._latencies: List[float] = []
+        self._cpu_share: Optional[float] = None
+        self._latency_p90_ms: Optional[float] = None
+        self._snapshot = self._make_snapshot()
+
+    @classmethod
+    def _build_points(cls, imgsz: int, min_imgsz: int, max_interval_sec: float, allow_resize: bool):
+        sizes = [imgsz]
+        while allow_resize:
+            nxt = int(sizes[-1] * 0.8) // 32 * 32
+            if nxt < max(min_imgsz, 32) or nxt == sizes[-1]:
+                break
+            sizes.append(nxt)
+        intervals = [i for i in cls.INTERVALS if i <= max_interval_sec] or [0.0]
+
+        # пауза и размер растут по очереди, так что каждая следующая точка дешевле
+        si = ii = 0
+        points = [(sizes[0], intervals[0])]
+        while si < len(sizes) - 1 or ii < len(intervals) - 1:
+            if ii < len(intervals) - 1:
+                ii += 1
+                points.append((sizes[si], intervals[ii]))
+            if si < len(sizes) - 1:
+                si += 1
+                points.append((sizes[si], intervals[ii]))
+        return points
+
+    @property
+    def imgsz(self) -> int:
+        return self.points[self.level][0]
+
+    @property
+    def interval(self) -> float:
+        return self.points[self.level][1]
+
+    def observe(self, infer_s: float):
+        """Вызывается после каждого инференса; раз в window_sec пересматривает рабочую точку."""
+        self._latencies.append(infer_s * 1000.0)
+
+        now = time.perf_counter()
+        wall = now - self._win_t0
+        if wall < self.window_sec:
+            return
+
+        cpu_now = time.process_time()
+        self._cpu_share = (cpu_now - self._win_cpu0) / (wall * self._cpus)
+        self._latency_p90_ms = _percentile(self._latencies, 90)
+        self._win_t0, self._win_cpu0 = now, cpu_now
+        self._latencies = []
+
+        if self.enabled:
+            loads = []
+            if self.target_cpu:
+                loads.append(self._cpu_share / self.target_cpu)
+            if self.latency_budget_ms:
+                loads.append(self._latency_p90_ms / self.latency_budget_ms)
+            load = max(loads)
+
+            prev = self.level
+            if load > 1.0 and self.level < len(self.points) - 1:
+                self.level += 1
+            elif load < self.HEADROOM and self.level > 0:
+                self.level -= 1
+            if self.level != prev:
+                print(f"[ADAPT] load={load:.2f} -> imgsz={self.imgsz} interval={self.interval:.2f}s")
+
+        self._snapshot = self._make_snapshot()
+
+    def _make_snapshot(self) -> Dict:
+        return {
+            "adaptive": self.enabled,
+            "level": self.level,
+            "levels": len(self.points),
+            "imgsz": self.imgsz,
+            "infer_interval_sec": self.interval,
+            "cpu_share": round(self._cpu_share, 3) if self._cpu_share is not None else None,
+            "latency_p90_ms": round(self._latency_p90_ms, 1) if self._latency_p90_ms is not None else None,
+        }
+
+    def snapshot(self) -> Dict:
+        return self._snapshot
+
 
 def pick_device() -> str:
     return "cuda" if torch.cuda.is_available() else "cpu"
 
 
+def log_startup(phase: str, took: Optional[float] = None):
+    since = time.perf_counter() - STARTED_AT
+    took_s = f" in {took:.2f}s" if took is not None else ""
+    print(f"[STARTUP] {phase}{took_s} (t+{since:.2f}s)")
+
+
+def _artifact_key(model_path: str, imgsz: int, backend: str, half: bool, batch: int) -> str:
+    """
+    Ключ кеша: сами веса (путь, размер, mtime), imgsz, бэкенд, точность и батч.
+    Хешировать сотни мегабайт весов на каждом старте дороже, чем stat().
+    """
+    p = Path(model_path)
+    try:
+        st = p.stat()
+        ident = f"{p.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+    except OSError:
+        # веса по имени (например, "yolo12x.pt") ultralytics скачает сам
+        ident = model_path
+    digest = hashlib.sha1(ident.encode("utf-8")).hexdigest()[:12]
+    precision = "fp16" if half else "fp32"
+    return f"{p.stem}-{digest}-{imgsz}-{backend}-{precision}-b{batch}"
+
+
+def _cached_artifact(cache_dir: Path, key: str) -> Optional[Path]:
+    # суффикс артефакта начинается с "." или "_" ("-b1" не должен совпасть с "-b16")
+    for pattern in (f"{key}.*", f"{key}_*"):
+        for candidate in cache_dir.glob(pattern):
+            # незавершённый экспорт оставляет .tmp — такой артефакт не берём
+            if not candidate.name.endswith(".tmp"):
+                return candidate
+    return None
+
+
+def load_model(cfg: CameraConfig, device: str, half: bool, batch: int = 1):
+    """
+    Загружает модель для инференса. Для backend != "pt" артефакт экспортируется
+    один раз и дальше берётся из model_cache_dir без повторной компиляции.
+    """
+    t0 = time.perf_counter()
+
+    if cfg.backend == "pt":
+        model = YOLO(cfg.model).to(device)
+        log_startup(f"model loaded ({cfg.model}, pt, {device})", time.perf_counter() - t0)
+        return model
+
+    cache_dir = Path(cfg.model_cache_dir).expanduser()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    key = _artifact_key(cfg.model, cfg.imgsz, cfg.backend, half, batch)
+
+    artifact = _cached_artifact(cache_dir, key)
+    if artifact is None:
+        src = YOLO(cfg.model)
+        exported = Path(src.export(
+            format=cfg.backend,
+            imgsz=cfg.imgsz,
+            half=half,
+            batch=batch,
+            dynamic=(cfg.backend != "torchscript"),
+            device=device,
+        ))
+        # "yolo12x.onnx" -> ".onnx", "yolo12x_openvino_model" -> "_openvino_model":
+        # ultralytics определяет формат по этому суффиксу
+        suffix = exported.name[len(Path(cfg.model).stem):]
+        artifact = cache_dir / f"{key}{suffix}"
+        # перенос через .tmp: оборванный экспорт не будет принят за готовый артефакт
+        tmp = cache_dir / f"{key}{suffix}.tmp"
+        if tmp.is_dir():
+            shutil.rmtree(tmp)
+        elif tmp.exists():
+            tmp.unlink()
+        shutil.move(str(exported), str(tmp))
+        tmp.rename(artifact)
+        log_startup(f"model exported to {artifact}", time.perf_counter() - t0)
+    else:
+        log_startup(f"model artifact cache hit: {artifact.name}")
+
+    t1 = time.perf_counter()
+    model = YOLO(str(artifact), task="detect")
+    log_startup(f"model loaded ({cfg.backend}, {device})", time.perf_counter() - t1)
+    return model
+
+
+def warmup(model, cfg: CameraConfig, device: str, half: bool, batch: int = 1):
+    """
+    Прогон на пустых кадрах до открытия потоков: аллокации, cudnn-autotune
+    и ленивая инициализация бэкенда не достаются первому живому кадру.
+    """
+    if cfg.warmup_runs <= 0:
+        return
+    dummy = np.zeros((cfg.imgsz, cfg.imgsz, 3), dtype=np.uint8)
+    frames = [dummy] * batch
+    t0 = time.perf_counter()
+    for _ in range(cfg.warmup_runs):
+        model.predict(
+            source=frames if batch > 1 else dummy,
+            imgsz=cfg.imgsz,
+            conf=cfg.conf,
+            iou=cfg.iou,
+            half=half,
+            verbose=False,
+            device=device
+        )
+    log_startup(f"warmup x{cfg.warmup_runs} (batch {batch})", time.perf_counter() - t0)
+
+
+def count_detections(result, names: Dict[int, str]):
+    """
+    Считает целевые классы в одном результате YOLO.
+    Возвращает счётчики по COCO-именам и список боксов для отрисовки.
+    """
+    counts: Dict[str, int] = {k: 0 for k in TARGET_CLASS_NAMES.keys()}
+    boxes_out = []
+
+    if result.boxes is None:
+        return counts, boxes_out
+
+    boxes = result.boxes.xyxy.cpu().numpy()
+    cls_ids = result.boxes.cls.cpu().numpy().astype(int)
+    confs = result.boxes.conf.cpu().numpy()
+
+    for box, cls_id, cf in zip(boxes, cls_ids, confs):
+        coco_name = names.get(cls_id, str(cls_id))
+        if coco_name not in TARGET_CLASS_NAMES:
+            continue
+        counts[coco_name] += 1
+        boxes_out.append((coco_name, box, float(cf)))
+
+    return counts, boxes_out
+
+
+def draw_detections(frame, boxes):
+    for coco_name, (x1, y1, x2, y2), cf in boxes:
+        color = COLORS.get(coco_name, (0, 255, 255))
+        cv2.rectangle(frame, (int(x1), int(y1)),
+                      (int(x2), int(y2)), color, 2)
+
+        label = f"{TARGET_CLASS_NAMES[coco_name]} {cf:.2f}"
+        cv2.putText(
+            frame, label,
+            (int(x1), int(y1) - 6),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.6, color, 2, cv2.LINE_AA
+        )
+
+
 def draw_hud(frame, counts_pretty: Dict[str, int], fps: float):
     cv2.putText(
         frame, f"FPS: {fps:.1f}",
@@ -181,110 +633,367 @@ def draw_hud(frame, counts_pretty: Dict[str, int], fps: float):
         y += 28
 
 
-def main():
-    device = pick_device()
-    print("[INFO] device:", device)
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
 
-    if device == "cuda":
-        torch.backends.cudnn.benchmark = True
 
-    model = YOLO(MODEL_PATH).to(device)
-    half = (device == "cuda")
+def _latency_stats(values_s: List[float]) -> Dict[str, float]:
+    ms = [v * 1000.0 for v in values_s]
+    return {
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "p50_ms": round(_percentile(ms, 50), 2),
+        "p90_ms": round(_percentile(ms, 90), 2),
+        "p99_ms": round(_percentile(ms, 99), 2),
+        "max_ms": round(max(ms), 2) if ms else 0.0,
+    }
 
-    grabber = RTSPGrabber(RTSP_URL)
-    grabber.start()
 
-    counts_queue: Queue = Queue(maxsize=1)
-    poster = CountsPoster(counts_queue, SEND_INTERVAL_SEC, ENDPOINT)
-    poster.start()
-
-    last_t = time.time()
-    fps_ema = 0.0
-    alpha = 0.1
+def _rss_mb() -> Dict[str, Optional[float]]:
+    """Текущий и пиковый RSS процесса; psutil опционален."""
+    out: Dict[str, Optional[float]] = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        import psutil  # type: ignore
+        out["rss_mb"] = round(psutil.Process().memory_info().rss / 2**20, 1)
+    except ImportError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдаёт КиБ, macOS — байты
+        out["peak_rss_mb"] = round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+    except ImportError:
+        pass
+    return out
 
-    MIN_INFER_DT = 0.0
-    last_infer_t = 0.0
 
-    try:
-        while True:
-            frame = grabber.get_latest()
+def iter_frames(source: str, max_frames: int = 0):
+    """
+    Кадры из видеофайла или папки с картинками: (ключ кадра, кадр, время декодирования).
+    Ключ — номер кадра для видео и имя файла для папки, так же он пишется в ground truth.
+    """
+    path = Path(source)
+    n = 0
+
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+        for f in files:
+            if max_frames and n >= max_frames:
+                return
+            t0 = time.perf_counter()
+            frame = cv2.imread(str(f))
+            dt = time.perf_counter() - t0
             if frame is None:
-                time.sleep(0.01)
+                print(f"[BENCH] skip unreadable image: {f}")
                 continue
+            n += 1
+            yield f.name, frame, dt
+        return
 
-            now = time.time()
-            if MIN_INFER_DT > 0 and (now - last_infer_t) < MIN_INFER_DT:
-                cv2.imshow("ASFES Camera Client (YOLO12x + RTSP + API)", frame)
-                if (cv2.waitKey(1) & 0xFF) in (27, ord("q")):
-                    break
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise FileNotFoundError(f"cannot open video: {source}")
+    try:
+        idx = 0
+        while not (max_frames and n >= max_frames):
+            t0 = time.perf_counter()
+            ok, frame = cap.read()
+            dt = time.perf_counter() - t0
+            if not ok or frame is None:
+                break
+            n += 1
+            yield str(idx), frame, dt
+            idx += 1
+    finally:
+        cap.release()
+
+
+def _compare_counts(
+    predicted: Dict[str, Dict[str, Dict[str, int]]],
+    ground_truth: Dict[str, Dict[str, Dict[str, int]]],
+) -> Dict:
+    """Сравнение посчитанного с разметкой: MAE по классам и доля кадров с точным совпадением."""
+    abs_err: Dict[str, List[int]] = {k: [] for k in TARGET_CLASS_NAMES}
+    labeled = 0
+    exact = 0
+
+    for source, frames in ground_truth.items():
+        got_frames = predicted.get(source, {})
+        for key, expected in frames.items():
+            got = got_frames.get(str(key))
+            if got is None:
                 continue
+            labeled += 1
+            frame_exact = True
+            for cls in TARGET_CLASS_NAMES:
+                err = abs(int(got.get(cls, 0)) - int(expected.get(cls, 0)))
+                abs_err[cls].append(err)
+                frame_exact = frame_exact and err == 0
+            exact += int(frame_exact)
+
+    all_err = [e for errs in abs_err.values() for e in errs]
+    return {
+        "frames_labeled": labeled,
+        "exact_match_rate": round(exact / labeled, 4) if labeled else None,
+        "mae": round(sum(all_err) / len(all_err), 4) if all_err else None,
+        "mae_per_class": {
+            cls: round(sum(errs) / len(errs), 4) if errs else None
+            for cls, errs in abs_err.items()
+        },
+    }
+
+
+def run_benchmark(cfg: CameraConfig, args) -> Dict:
+    """
+    Офлайн-прогон того же конвейера grab → infer → count по локальным файлам.
+    Сеть и RTSP не нужны; на машине без CUDA всё считается на CPU.
+    """
+    device = args.device or pick_device()
+    half = (device == "cuda")
+    model = load_model(cfg, device, half)
 
-            last_infer_t = now
+    decode_t: List[float] = []
+    infer_t: List[float] = []
+    post_t: List[float] = []
+    predicted: Dict[str, Dict[str, Dict[str, int]]] = {}
+
+    frames_total = 0
+    wall_t0 = cpu_t0 = None
 
+    for source in args.bench:
+        source_key = Path(source).name
+        per_frame = predicted.setdefault(source_key, {})
+
+        for key, frame, dec in iter_frames(source, args.bench_max_frames):
+            t1 = time.perf_counter()
             results = model.predict(
                 source=frame,
-                imgsz=IMGSZ,
-                conf=CONF,
-                iou=IOU,
+                imgsz=cfg.imgsz,
+                conf=cfg.conf,
+                iou=cfg.iou,
                 half=half,
                 verbose=False,
                 device=device
             )
+            t2 = time.perf_counter()
+            counts, _ = count_detections(results[0], model.names)
+            t3 = time.perf_counter()
 
-            counts: Dict[str, int] = {k: 0 for k in TARGET_CLASS_NAMES.keys()}
-
-            for r in results:
-                if r.boxes is None:
-                    continue
-                boxes = r.boxes.xyxy.cpu().numpy()
-                cls_ids = r.boxes.cls.cpu().numpy().astype(int)
-                confs = r.boxes.conf.cpu().numpy()
+            per_frame[key] = counts
+            frames_total += 1
 
-                for (x1, y1, x2, y2), cls_id, cf in zip(boxes, cls_ids, confs):
-                    coco_name = model.names.get(cls_id, str(cls_id))
-                    if coco_name not in TARGET_CLASS_NAMES:
-                        continue
+            # первые кадры платят за аллокации и прогрев — в статистику не идут
+            if frames_total <= args.bench_warmup:
+                continue
+            if wall_t0 is None:
+                wall_t0 = t1 - dec
+                cpu_t0 = time.process_time()
+
+            decode_t.append(dec)
+            infer_t.append(t2 - t1)
+            post_t.append(t3 - t2)
+
+    measured = len(infer_t)
+    wall = (time.perf_counter() - wall_t0) if wall_t0 is not None else 0.0
+    cpu = (time.process_time() - cpu_t0) if cpu_t0 is not None else 0.0
+
+    report: Dict = {
+        "model": cfg.model,
+        "backend": cfg.backend,
+        "imgsz": cfg.imgsz,
+        "conf": cfg.conf,
+        "iou": cfg.iou,
+        "device": device,
+        "sources": list(args.bench),
+        "frames": frames_total,
+        "frames_measured": measured,
+        "fps": round(measured / wall, 2) if wall > 0 else 0.0,
+        "cpu_percent": round(100.0 * cpu / wall, 1) if wall > 0 else 0.0,
+        **_rss_mb(),
+        "latency": {
+            "decode": _latency_stats(decode_t),
+            "infer": _latency_stats(infer_t),
+            "post": _latency_stats(post_t),
+            "total": _latency_stats([a + b + c for a, b, c in zip(decode_t, infer_t, post_t)]),
+        },
+    }
+
+    if args.gt:
+        ground_truth = json.loads(Path(args.gt).read_text(encoding="utf-8"))
+        report["accuracy"] = _compare_counts(predicted, ground_truth)
+
+    return report
+
+
+def print_benchmark(report: Dict):
+    print(f"[BENCH] {report['model']} ({report['backend']}) imgsz={report['imgsz']} conf={report['conf']} device={report['device']}")
+    print(f"[BENCH] frames: {report['frames_measured']}/{report['frames']}  fps: {report['fps']}  "
+          f"cpu: {report['cpu_percent']}%  rss: {report['rss_mb']} MiB  peak: {report['peak_rss_mb']} MiB")
+    for stage, st in report["latency"].items():
+        print(f"[BENCH] {stage:<7} p50={st['p50_ms']:>8.2f}ms  p90={st['p90_ms']:>8.2f}ms  "
+              f"p99={st['p99_ms']:>8.2f}ms  max={st['max_ms']:>8.2f}ms")
+    acc = report.get("accuracy")
+    if acc:
+        print(f"[BENCH] labeled frames: {acc['frames_labeled']}  exact: {acc['exact_match_rate']}  mae: {acc['mae']}")
+        for cls, mae in acc["mae_per_class"].items():
+            print(f"[BENCH]   {cls}: mae={mae}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ASFES camera client (YOLO + RTSP + API)")
+    parser.add_argument(
+        "--config",
+        default=os.getenv("ASFES_CAMERA_CONFIG"),
+        help="JSON со списком потоков; без него используется один поток из констант",
+    )
+    parser.add_argument("--model", help="переопределить файл модели")
+    parser.add_argument("--imgsz", type=int, help="переопределить IMGSZ")
+    parser.add_argument("--conf", type=float, help="переопределить CONF")
+    parser.add_argument("--device", help="cpu / cuda / cuda:0; по умолчанию выбирается автоматически")
+    parser.add_argument("--backend", choices=BACKENDS, help="формат модели; экспорт кешируется на диске")
+    parser.add_argument("--target-cpu", type=float, help="адаптивный режим: целевая доля CPU машины (0..1)")
+    parser.add_argument("--latency-budget-ms", type=float, help="адаптивный режим: бюджет p90 задержки инференса")
+
+    bench = parser.add_argument_group("benchmark")
+    bench.add_argument(
+        "--bench", nargs="+", metavar="SOURCE",
+        help="офлайн-бенчмарк: видеофайлы или папки с картинками вместо RTSP",
+    )
+    bench.add_argument("--gt", help="JSON с разметкой: {источник: {кадр: {класс: число}}}")
+    bench.add_argument("--bench-warmup", type=int, default=3, help="сколько первых кадров не учитывать")
+    bench.add_argument("--bench-max-frames", type=int, default=0, help="ограничение кадров на источник")
+    bench.add_argument("--bench-report", help="куда записать JSON-отчёт")
+    return parser.parse_args(argv)
+
+
+def apply_overrides(cfg: CameraConfig, args) -> CameraConfig:
+    if args.model:
+        cfg.model = args.model
+    if args.imgsz:
+        cfg.imgsz = args.imgsz
+    if args.conf is not None:
+        cfg.conf = args.conf
+    if args.backend:
+        cfg.backend = args.backend
+    if args.target_cpu is not None:
+        cfg.target_cpu = args.target_cpu
+    if args.latency_budget_ms is not None:
+        cfg.latency_budget_ms = args.latency_budget_ms
+    return cfg
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cfg = load_config(args.config) if args.config else default_config()
+    cfg = apply_overrides(cfg, args)
+
+    if args.bench:
+        report = run_benchmark(cfg, args)
+        print_benchmark(report)
+        if args.bench_report:
+            Path(args.bench_report).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        return
+
+    device = args.device or pick_device()
+    print("[INFO] device:", device)
+    print("[INFO] streams:", ", ".join(s.name for s in cfg.streams))
 
-                    counts[coco_name] += 1
+    if device == "cuda":
+        torch.backends.cudnn.benchmark = True
 
-                    color = COLORS.get(coco_name, (0, 255, 255))
-                    cv2.rectangle(frame, (int(x1), int(y1)),
-                                  (int(x2), int(y2)), color, 2)
+    half = (device == "cuda")
+    batch = len(cfg.streams)
+    model = load_model(cfg, device, half, batch)
+    warmup(model, cfg, device, half, batch)
+
+    controller = AdaptiveController(
+        cfg.imgsz,
+        target_cpu=cfg.target_cpu,
+        latency_budget_ms=cfg.latency_budget_ms,
+        min_imgsz=cfg.min_imgsz,
+        max_interval_sec=cfg.max_infer_interval_sec,
+        # экспортированные артефакты собраны под фиксированный imgsz
+        allow_resize=(cfg.backend == "pt"),
+    )
+    if controller.enabled:
+        print(f"[INFO] adaptive: target_cpu={cfg.target_cpu} latency_budget_ms={cfg.latency_budget_ms} "
+              f"points={controller.points}")
 
-                    label = f"{TARGET_CLASS_NAMES[coco_name]} {cf:.2f}"
-                    cv2.putText(
-                        frame, label,
-                        (int(x1), int(y1) - 6),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.6, color, 2, cv2.LINE_AA
-                    )
+    workers = [StreamWorker(s, cfg, controller.snapshot) for s in cfg.streams]
+    for w in workers:
+        w.start()
+    log_startup("streams started")
+    first_batch = True
 
-            counts_pretty = {TARGET_CLASS_NAMES[k]: v for k, v in counts.items()}
+    last_infer_t = 0.0
 
-            new_t = time.time()
-            dt = new_t - last_t
-            last_t = new_t
-            inst_fps = (1.0 / dt) if dt > 1e-6 else 0.0
-            fps_ema = inst_fps if fps_ema == 0.0 else (fps_ema * (1 - alpha) + inst_fps * alpha)
+    try:
+        while True:
+            now = time.time()
+            if controller.interval > 0 and (now - last_infer_t) < controller.interval:
+                if cfg.show and (cv2.waitKey(1) & 0xFF) in (27, ord("q")):
+                    break
+                time.sleep(0.005)
+                continue
 
-            draw_hud(frame, counts_pretty, fps_ema)
+            # Свежие кадры со всех потоков идут в модель одним батчем:
+            # веса и накладные расходы на вызов общие для всех камер.
+            batch_workers: List[StreamWorker] = []
+            frames = []
+            for w in workers:
+                w.seen_id, frame = w.grabber.get_latest_since(w.seen_id)
+                if frame is not None:
+                    batch_workers.append(w)
+                    frames.append(frame)
+
+            if not frames:
+                time.sleep(0.01)
+                continue
 
-            if counts_queue.full():
-                try:
-                    counts_queue.get_nowait()
-                except Empty:
-                    pass
-            counts_queue.put_nowait(counts)
+            last_infer_t = now
 
-            cv2.imshow("ASFES Camera Client (YOLO12x + RTSP + API)", frame)
-            key = cv2.waitKey(1) & 0xFF
-            if key in (27, ord("q")):
-                break
+            t0 = time.perf_counter()
+            results = model.predict(
+                source=frames,
+                imgsz=controller.imgsz,
+                conf=cfg.conf,
+                iou=cfg.iou,
+                half=half,
+                verbose=False,
+                device=device
+            )
+            controller.observe(time.perf_counter() - t0)
+
+            if first_batch:
+                first_batch = False
+                log_startup(f"first live batch inferred ({len(frames)}/{len(workers)} streams)")
+
+            for w, frame, r in zip(batch_workers, frames, results):
+                counts, boxes = count_detections(r, model.names)
+                w.push_counts(counts)
+                fps = w.tick_fps()
+
+                if cfg.show:
+                    draw_detections(frame, boxes)
+                    counts_pretty = {TARGET_CLASS_NAMES[k]: v for k, v in counts.items()}
+                    draw_hud(frame, counts_pretty, fps)
+                    cv2.imshow(w.window, frame)
+
+            if cfg.show:
+                key = cv2.waitKey(1) & 0xFF
+                if key in (27, ord("q")):
+                    break
 
     finally:
-        grabber.stop()
-        poster.stop()
-        cv2.destroyAllWindows()
+        for w in workers:
+            w.stop()
+        if cfg.show:
+            cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
@@ -12,6 +12,14 @@ from fastapi.responses import FileResponse, JSONResponse
 from asfeslib.databases.MongoDB import connect_mongo, MongoConnectScheme
 from asfeslib.weather.client import WeatherApiClient
 from server.core.inti_root_user import init_root_user
+from server.core.tasks import start_periodic, stop_periodic
+from server.core.supply_sweeper import sweep_overdue_supplies
+from server.core.stats import rebuild_stats
+from server.core.notifications import migrate_notifications
+from server.core.retention import ensure_retention
+from server.core.migrations import run_migrations
+from server.core.snapshots import take_stock_snapshots
+from server.core.export_jobs import cleanup_export_jobs, recover_export_jobs, stop_export_jobs
 
 import logging
 from asfeslib.core.logger import Logger
@@ -63,9 +71,42 @@ async def lifespan(app: FastAPI):
         log.error("MongoDB connection failed")
 
     await init_root_user(log=settings.DEV)
+    await migrate_notifications(db)
+    # миграции раньше сроков хранения: TTL камеры включается только после свёртки history_daily
+    log.info("Migrations: %s", await run_migrations(db))
+    log.info("Retention: %s", await ensure_retention(db))
+    await recover_export_jobs(db)
+
+    start_periodic(
+        app,
+        "overdue_sweeper",
+        settings.OVERDUE_SWEEP_INTERVAL_SEC,
+        lambda: sweep_overdue_supplies(db),
+    )
+    start_periodic(
+        app,
+        "stats_reconcile",
+        settings.STATS_RECONCILE_INTERVAL_SEC,
+        lambda: rebuild_stats(db),
+    )
+    start_periodic(
+        app,
+        "stock_snapshots",
+        settings.STOCK_SNAPSHOT_INTERVAL_SEC,
+        lambda: take_stock_snapshots(db, min_age_sec=settings.STOCK_SNAPSHOT_INTERVAL_SEC / 2),
+    )
+    start_periodic(
+        app,
+        "export_cleanup",
+        settings.EXPORT_CLEANUP_INTERVAL_SEC,
+        lambda: cleanup_export_jobs(db),
+    )
 
     yield
 
+    await stop_periodic(app)
+    await stop_export_jobs()
+
     try:
         client.close()
         log.info("MongoDB client closed")
@@ -138,6 +179,7 @@ from server.routes.root.companies import router as root_companies_router
 from server.routes.dashboard import router as dashboard_router
 from server.routes.notifications import router as notifications_router
 from server.routes.export import router as export_router
+from server.routes.history import router as history_router
 
 from server.routes.dev.dev_test_mail import router as test_mail_route
 
@@ -154,6 +196,7 @@ for r in (
     dashboard_router,
     notifications_router,
     export_router,
+    history_router,
     test_mail_route,
 ):
     app.include_router(r)
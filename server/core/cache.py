@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fresh_until: float
+    stale_until: float
+
+
+class TTLCache:
+    """
+    Кеш ответов в памяти процесса.
+
+    - свежее значение (моложе ttl) отдаётся сразу;
+    - устаревшее, но моложе ttl + stale_ttl, отдаётся сразу, а пересчёт уходит в фон;
+    - параллельные промахи по одному ключу ждут одно вычисление (singleflight).
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.metrics: Dict[str, int] = {"hits": 0, "stale": 0, "coalesced": 0, "recomputes": 0, "errors": 0}
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl <= 0:
+            return await compute()
+
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry and now < entry.fresh_until:
+            self.metrics["hits"] += 1
+            return entry.value
+
+        if entry and now < entry.stale_until:
+            self.metrics["stale"] += 1
+            if key not in self._inflight:
+                self._start(key, compute)
+            return entry.value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.metrics["coalesced"] += 1
+        else:
+            task = self._start(key, compute)
+        # вычисление живёт отдельно от запросов: отключение одного клиента не отменяет его для остальных
+        return await asyncio.shield(task)
+
+    def _start(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        # регистрируем до первого await, чтобы следующий запрос уже видел пересчёт
+        self.metrics["recomputes"] += 1
+        task = asyncio.create_task(self._compute(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+        except Exception:
+            self.metrics["errors"] += 1
+            raise
+
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        self._entries[key] = _Entry(value, now + self.ttl, now + self.ttl + self.stale_ttl)
+        self._evict(now)
+        return value
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # ожидающих может не быть — не оставляем "never retrieved"
+
+    def _evict(self, now: float) -> None:
+        if len(self._entries) <= self.max_entries:
+            return
+        for k in [k for k, e in self._entries.items() if e.stale_until <= now]:
+            del self._entries[k]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.metrics, "entries": len(self._entries), "inflight": len(self._inflight)}
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Sequence, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+# (колонка, тип): string | int | bool | timestamp
+Columns = List[Tuple[str, str]]
+
+ROW_GROUP_ROWS = 64 * 1024
+
+FORMATS = {
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(501, "Экспорт в Parquet/Arrow недоступен: на сервере не установлен pyarrow.")
+    return pa, pq
+
+
+def ensure_available() -> None:
+    """Проверка до начала ответа: после первого байта статус уже не поменять."""
+    _pyarrow()
+
+
+def _schema(pa, columns: Columns):
+    types = {
+        "string": pa.string(),
+        "int": pa.int64(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("ms", tz="UTC"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def _cell(kind: str, v: Any) -> Any:
+    if v is None:
+        return None
+    if kind == "timestamp":
+        return v if isinstance(v, datetime) else None
+    if kind == "string":
+        return str(v) if isinstance(v, ObjectId) else v
+    return v
+
+
+class ChunkSink:
+    """Несеекабельный приёмник: writer пишет сюда, мы отдаём накопленное клиенту."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        b = bytes(data)
+        self._parts.append(b)
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+async def columnar_chunks(
+    fmt: str,
+    columns: Columns,
+    rows: AsyncIterator[Sequence[Any]],
+    *,
+    row_group_rows: int = ROW_GROUP_ROWS,
+) -> AsyncIterator[bytes]:
+    """
+    Parquet (zstd) или Arrow IPC file (zstd) из асинхронного потока строк.
+    Строки копятся по колонкам до row_group_rows и сбрасываются одной группой;
+    кодирование идёт в потоке, чтобы не держать event loop.
+    """
+    pa, pq = _pyarrow()
+    schema = _schema(pa, columns)
+    sink = ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+
+    kinds = [kind for _, kind in columns]
+    cols: List[List[Any]] = [[] for _ in columns]
+
+    def _write_group(group: List[List[Any]]) -> None:
+        arrays = [pa.array(c, type=f.type) for c, f in zip(group, schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    async def _flush_group():
+        nonlocal cols
+        group, cols = cols, [[] for _ in columns]
+        await asyncio.to_thread(_write_group, group)
+
+    try:
+        async for r in rows:
+            for c, kind, v in zip(cols, kinds, r):
+                c.append(_cell(kind, v))
+            if len(cols[0]) >= row_group_rows:
+                await _flush_group()
+                out = sink.drain()
+                if out:
+                    yield out
+        if cols[0]:
+            await _flush_group()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, Final
+from typing import Dict, Optional, Final
 from functools import lru_cache
 
 from pydantic import Field, AnyUrl, EmailStr, model_validator
@@ -20,6 +20,25 @@ class Settings(BaseSettings):
  
     WEATHER_API_KEY: str = Field(...)
 
+    OVERDUE_SWEEP_INTERVAL_SEC: int = Field(60)
+    STATS_RECONCILE_INTERVAL_SEC: int = Field(3600)
+    DASHBOARD_CACHE_TTL_SEC: float = Field(5.0)
+    DASHBOARD_CACHE_STALE_SEC: float = Field(30.0)
+
+    # Хранение (дней, 0 — вечно)
+    NOTIFICATION_TTL_DAYS: int = Field(90)
+    NOTIFICATION_TTL_DAYS_BY_TYPE: Dict[str, int] = Field(default_factory=dict)
+    CAMERA_HISTORY_TTL_DAYS: int = Field(0)
+    STOCK_SNAPSHOT_TTL_DAYS: int = Field(400)
+
+    STOCK_SNAPSHOT_INTERVAL_SEC: int = Field(24 * 3600)
+
+    # Фоновые выгрузки (export_jobs)
+    EXPORT_JOBS_CONCURRENCY: int = Field(2)
+    EXPORT_JOBS_PER_COMPANY: int = Field(3)
+    EXPORT_JOB_TTL_HOURS: int = Field(24)
+    EXPORT_CLEANUP_INTERVAL_SEC: int = Field(3600)
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
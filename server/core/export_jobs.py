@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from server.core.config import settings
+from server.core.exports import data_fingerprint, export_stream
+from server.core.paths import EXPORTS_DIR
+
+JOBS = "export_jobs"
+ACTIVE = ["queued", "running"]
+
+# ограничение одновременных выгрузок на процесс: курсоры по всему складу бьют по primary
+_slots = asyncio.Semaphore(max(1, settings.EXPORT_JOBS_CONCURRENCY))
+_tasks: Set[asyncio.Task] = set()
+
+
+def job_path(job: Dict[str, Any]) -> Path:
+    return EXPORTS_DIR / job["file"]
+
+
+def _expire_at(now: datetime) -> datetime:
+    return now + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)
+
+
+async def submit_export_job(db, wh, kind: str, *, fmt: str, gzip: bool, by_user_id, log) -> Dict[str, Any]:
+    """
+    Ставит выгрузку в очередь или возвращает уже готовую/идущую с той же версией данных.
+    Результат: документ задачи + reused. log — логгер приложения (app.state.log).
+    """
+    if fmt != "csv":
+        gzip = False
+    # формат проверяется сразу, а не в фоне
+    filename, media_type, body = export_stream(db, wh, kind, fmt=fmt, gzip=gzip)
+    await body.aclose()
+
+    now = datetime.now(timezone.utc)
+    fingerprint = await data_fingerprint(db, wh, kind)
+    key = {"warehouse_id": wh["_id"], "kind": kind, "format": fmt, "gzip": gzip, "fingerprint": fingerprint}
+
+    async for job in db[JOBS].find({**key, "status": {"$in": ACTIVE + ["done"]}}).sort("created_at", -1).limit(1):
+        if job["status"] != "done" or job_path(job).exists():
+            await db[JOBS].update_one({"_id": job["_id"]}, {"$set": {"expire_at": _expire_at(now)}})
+            return {**job, "reused": True}
+
+    active = await db[JOBS].count_documents({"company_id": wh["company_id"], "status": {"$in": ACTIVE}})
+    if active >= settings.EXPORT_JOBS_PER_COMPANY:
+        raise HTTPException(429, "Слишком много выгрузок в работе. Дождитесь завершения текущих.")
+
+    _id = ObjectId()
+    job = {
+        "_id": _id,
+        **key,
+        "company_id": wh["company_id"],
+        "by_user_id": by_user_id,
+        "status": "queued",
+        "filename": filename,
+        "media_type": media_type,
+        "file": f"{_id}{''.join(Path(filename).suffixes)}",
+        "size": None,
+        "error": None,
+        "created_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "expire_at": _expire_at(now),
+    }
+    await db[JOBS].insert_one(job)
+
+    task = asyncio.create_task(_run_job(db, job, log), name=f"export:{_id}")
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return {**job, "reused": False}
+
+
+async def _run_job(db, job: Dict[str, Any], log) -> None:
+    async with _slots:
+        path = job_path(job)
+        tmp = path.with_name(path.name + ".part")
+        try:
+            wh = await db["warehouses"].find_one({"_id": job["warehouse_id"]})
+            if not wh:
+                raise RuntimeError("Склад удалён.")
+            await db[JOBS].update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "running", "started_at": datetime.now(timezone.utc)}},
+            )
+
+            _, _, body = export_stream(db, wh, job["kind"], fmt=job["format"], gzip=job["gzip"])
+            size = 0
+            with open(tmp, "wb") as f:
+                async for chunk in body:
+                    await asyncio.to_thread(f.write, chunk)
+                    size += len(chunk)
+            os.replace(tmp, path)
+
+            now = datetime.now(timezone.utc)
+            await db[JOBS].update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "done", "size": size, "finished_at": now, "expire_at": _expire_at(now)}},
+            )
+        except asyncio.CancelledError:
+            tmp.unlink(missing_ok=True)
+            raise
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            log.exception("[export %s] failed: %r", job["_id"], e)
+            await db[JOBS].update_one(
+                {"_id": job["_id"]},
+                {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc)}},
+            )
+
+
+async def recover_export_jobs(db) -> int:
+    """После рестарта незавершённые задачи уже никто не выполнит — помечаем их failed."""
+    res = await db[JOBS].update_many(
+        {"status": {"$in": ACTIVE}},
+        {"$set": {"status": "failed", "error": "Прервано перезапуском сервера.", "finished_at": datetime.now(timezone.utc)}},
+    )
+    return res.modified_count
+
+
+async def stop_export_jobs() -> None:
+    for t in list(_tasks):
+        t.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+
+
+async def cleanup_export_jobs(db, *, now: Optional[datetime] = None) -> int:
+    """Удаляет просроченные задачи с файлами и файлы, у которых задачи уже нет."""
+    now = now or datetime.now(timezone.utc)
+    removed = 0
+    async for job in db[JOBS].find({"status": {"$nin": ACTIVE}, "expire_at": {"$lt": now}}, {"file": 1}):
+        job_path(job).unlink(missing_ok=True)
+        await db[JOBS].delete_one({"_id": job["_id"]})
+        removed += 1
+
+    known = {j["file"] async for j in db[JOBS].find({}, {"file": 1})}
+    stale_before = (now - timedelta(hours=settings.EXPORT_JOB_TTL_HOURS)).timestamp()
+    for p in EXPORTS_DIR.iterdir():
+        name = p.name[:-len(".part")] if p.name.endswith(".part") else p.name
+        if name not in known and p.stat().st_mtime < stale_before:
+            p.unlink(missing_ok=True)
+            removed += 1
+    return removed
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import re
+import zipfile
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from server.core.columnar import FORMATS, ChunkSink, Columns, columnar_chunks, ensure_available
+
+EXPORT_BATCH = 1000  # документов за один getMore
+FLUSH_BYTES = 64 * 1024  # сколько CSV копить перед отправкой клиенту
+
+ITEM_COLUMNS: Columns = [
+    ("name", "string"),
+    ("category", "string"),
+    ("unit", "string"),
+    ("count", "int"),
+    ("low_limit", "int"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+]
+SUPPLY_COLUMNS: Columns = [
+    ("item_name", "string"),
+    ("amount", "int"),
+    ("expected_at", "timestamp"),
+    ("status", "string"),
+    ("note", "string"),
+    ("overdue", "bool"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+]
+HISTORY_COLUMNS: Columns = [
+    ("item_name", "string"),
+    ("type", "string"),
+    ("amount", "int"),
+    ("ts", "timestamp"),
+    ("note", "string"),
+    ("by_user_id", "string"),
+]
+
+
+def _iso(dt):
+    if not dt:
+        return ""
+    if isinstance(dt, str):
+        return dt
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def _utc(dt):
+    if dt and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _csv_value(v: Any) -> Any:
+    if v is None:
+        return ""
+    if isinstance(v, datetime):
+        return _iso(v)
+    if isinstance(v, bool):
+        return "yes" if v else "no"
+    if isinstance(v, ObjectId):
+        return str(v)
+    return v
+
+
+async def _csv_chunks(columns: Columns, rows: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _ in columns])
+    # заголовок уходит сразу, не дожидаясь первой пачки из Mongo
+    yield buf.getvalue().encode("utf-8")
+    buf.seek(0)
+    buf.truncate(0)
+
+    async for r in rows:
+        writer.writerow([_csv_value(v) for v in r])
+        if buf.tell() >= FLUSH_BYTES:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+async def _gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    first = True
+    async for chunk in chunks:
+        out = z.compress(chunk)
+        if first:
+            out += z.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if out:
+            yield out
+    yield z.flush()
+
+
+async def _item_rows(db, wh) -> AsyncIterator[Sequence[Any]]:
+    default_low = wh.get("low_stock_default", 1)
+    cursor = db["items"].find(
+        {"warehouse_id": wh["_id"], "deleted_at": None},
+        {"name": 1, "category": 1, "unit": 1, "count": 1, "low_limit": 1, "created_at": 1, "updated_at": 1},
+    ).batch_size(EXPORT_BATCH)
+    async for i in cursor:
+        low = i.get("low_limit")
+        if low is None:
+            low = default_low
+        yield (
+            i.get("name"),
+            i.get("category"),
+            i.get("unit"),
+            i.get("count"),
+            low,
+            _utc(i.get("created_at")),
+            _utc(i.get("updated_at")),
+        )
+
+
+async def _supply_rows(db, wh) -> AsyncIterator[Sequence[Any]]:
+    now = datetime.now(timezone.utc)
+    cursor = db["supplies"].find(
+        {"warehouse_id": wh["_id"]},
+        {"item_name": 1, "amount": 1, "expected_at": 1, "status": 1, "note": 1, "created_at": 1, "updated_at": 1},
+    ).batch_size(EXPORT_BATCH)
+    async for s in cursor:
+        exp = _utc(s.get("expected_at"))
+        yield (
+            s.get("item_name", "—"),
+            s.get("amount"),
+            exp,
+            s.get("status"),
+            s.get("note") or "",
+            bool(exp and s.get("status") == "waiting" and exp < now),
+            _utc(s.get("created_at")),
+            _utc(s.get("updated_at")),
+        )
+
+
+async def _history_rows(db, wh) -> AsyncIterator[Sequence[Any]]:
+    cursor = (
+        db["history"]
+        .find(
+            {"warehouse_id": wh["_id"]},
+            {"item_name": 1, "type": 1, "amount": 1, "ts": 1, "note": 1, "by_user_id": 1},
+        )
+        .sort([("ts", -1), ("_id", -1)])
+        .batch_size(EXPORT_BATCH)
+    )
+    async for h in cursor:
+        yield (
+            h.get("item_name", "—"),
+            h.get("type"),
+            h.get("amount"),
+            _utc(h.get("ts")),
+            h.get("note") or "",
+            h.get("by_user_id"),
+        )
+
+
+# вид выгрузки -> (колонки, генератор строк, право)
+EXPORT_KINDS = {
+    "items": (ITEM_COLUMNS, _item_rows, "items.update"),
+    "supplies": (SUPPLY_COLUMNS, _supply_rows, "supplies.update"),
+    "history": (HISTORY_COLUMNS, _history_rows, "items.update"),
+}
+
+
+def check_format(fmt: str) -> None:
+    if fmt == "csv":
+        return
+    if fmt in FORMATS:
+        ensure_available()
+        return
+    raise HTTPException(400, "Неизвестный формат экспорта. Допустимо: csv, parquet, arrow.")
+
+
+def export_stream(db, wh, kind: str, *, fmt: str = "csv", gzip: bool = False) -> Tuple[str, str, AsyncIterator[bytes]]:
+    """(имя файла, media type, поток байт) выгрузки склада; ошибки формата — до первого байта."""
+    check_format(fmt)
+    columns, rows_of, _ = EXPORT_KINDS[kind]
+    rows = rows_of(db, wh)
+    name = f"{kind}_{wh['_id']}"
+
+    if fmt == "csv":
+        body = _csv_chunks(columns, rows)
+        if gzip:
+            return f"{name}.csv.gz", "application/gzip", _gzip_chunks(body)
+        return f"{name}.csv", "text/csv; charset=utf-8", body
+
+    # Parquet/Arrow сжимаются сами (zstd), gzip поверх не нужен
+    ext, media_type = FORMATS[fmt]
+    return f"{name}.{ext}", media_type, columnar_chunks(fmt, columns, rows)
+
+
+def _folder(wh) -> str:
+    name = re.sub(r'[\\/:*?"<>|]+', "_", (wh.get("name") or "").strip()) or "warehouse"
+    return f"{name}_{wh['_id']}"
+
+
+async def company_bundle(db, warehouses: List[Dict[str, Any]], kinds: List[str], *, fmt: str = "csv") -> AsyncIterator[bytes]:
+    """
+    Zip с выгрузками всех складов: <склад>_<id>/<kind>.<ext>.
+    Архив пишется в несеекабельный приёмник (CRC и размеры — в data descriptor
+    после каждого файла), каждый файл — прямо из своего курсора, целиком архив нигде не лежит.
+    """
+    sink = ChunkSink()
+    date_time = datetime.now().timetuple()[:6]
+    # parquet/arrow уже сжаты — кладём как есть
+    compress_type = zipfile.ZIP_DEFLATED if fmt == "csv" else zipfile.ZIP_STORED
+
+    with zipfile.ZipFile(sink, "w") as zf:
+        for wh in warehouses:
+            for kind in kinds:
+                filename, _, body = export_stream(db, wh, kind, fmt=fmt)
+                info = zipfile.ZipInfo(f"{_folder(wh)}/{kind}{''.join(Path(filename).suffixes)}", date_time=date_time)
+                info.compress_type = compress_type
+                with zf.open(info, "w", force_zip64=True) as member:
+                    async for chunk in body:
+                        member.write(chunk)
+                        out = sink.drain()
+                        if out:
+                            yield out
+    yield sink.drain()
+
+
+async def _max_fields(coll, match: Dict[str, Any], *fields: str) -> Dict[str, Any]:
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": None, "n": {"$sum": 1}, **{f: {"$max": f"${f}"} for f in fields}}},
+    ]
+    async for g in coll.aggregate(pipeline):
+        g.pop("_id", None)
+        return g
+    return {}
+
+
+async def data_fingerprint(db, wh, kind: str) -> str:
+    """
+    Версия данных выгрузки: меняется при любом изменении строк, попадающих в файл.
+    items/supplies — число документов и максимум updated_at (+ то, что считается
+    на лету: порог склада, просрочка); history — число строк, последняя и максимум updated_at:
+    строки дописываются, а на месте меняются только item_name / unit при переименовании.
+    """
+    q = {"warehouse_id": wh["_id"]}
+    if kind == "items":
+        parts: Any = [wh.get("low_stock_default"), await _max_fields(db["items"], q, "updated_at", "deleted_at")]
+    elif kind == "supplies":
+        now = datetime.now(timezone.utc)
+        overdue = await db["supplies"].count_documents({**q, "status": "waiting", "expected_at": {"$lt": now}})
+        parts = [overdue, await _max_fields(db["supplies"], q, "updated_at")]
+    else:
+        last = await db["history"].find_one(q, {"_id": 1}, sort=[("ts", -1), ("_id", -1)])
+        parts = [await _max_fields(db["history"], q, "updated_at"), last and last["_id"]]
+    return hashlib.sha1(repr([kind, parts]).encode("utf-8")).hexdigest()[:20]
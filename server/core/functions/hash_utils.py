@@ -1,7 +1,15 @@
 from __future__ import annotations
 
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
 import bcrypt
 
+# bcrypt отпускает GIL на время хеширования, поэтому потоки дают настоящий параллелизм
+_hash_pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="bcrypt")
+
 
 def hash_password(password: str) -> str:
     if not isinstance(password, str):
@@ -9,6 +17,16 @@ def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=12)).decode("utf-8")
 
 
+async def hash_password_async(password: str) -> str:
+    """hash_password вне event loop: ~0.25 с CPU на пароль не блокирует остальные запросы."""
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_password, password)
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """Пачка паролей параллельно в пуле; порядок результата совпадает с входом."""
+    return list(await asyncio.gather(*(hash_password_async(p) for p in passwords)))
+
+
 def verify_password(password: str, hashed: str) -> bool:
     if not isinstance(password, str) or not isinstance(hashed, str):
         return False
@@ -12,34 +12,47 @@ def has_perm(user: dict, perm: str) -> bool:
     return "*" in perms or perm in perms
 
 
-def require_permission(perm: str):
-    async def dep(request: Request):
-        token = request.headers.get("authorization")
-        if not token or not token.lower().startswith("bearer "):
-            raise HTTPException(status_code=401, detail="Missing token")
+async def _current_user(request: Request) -> dict:
+    token = request.headers.get("authorization")
+    if not token or not token.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="Missing token")
+
+    token = token.split(" ", 1)[1].strip()
+    payload = decode_jwt(token)
+
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
 
-        token = token.split(" ", 1)[1].strip()
-        payload = decode_jwt(token)
+    db = request.app.state.mongo_db
+    user = await db["users"].find_one({"_id": oid(user_id), "deleted_at": None})
 
-        if not payload:
-            raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
 
-        user_id = payload.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
+    if user.get("blocked_at"):
+        raise HTTPException(status_code=403, detail="User blocked")
 
-        db = request.app.state.mongo_db
-        user = await db["users"].find_one({"_id": oid(user_id), "deleted_at": None})
+    return user
 
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
 
-        if user.get("blocked_at"):
-            raise HTTPException(status_code=403, detail="User blocked")
+def check_permission(user: dict, perm: str) -> None:
+    if not has_perm(user, perm):
+        raise HTTPException(status_code=403, detail=f"No permission: {perm}")
 
-        if not has_perm(user, perm):
-            raise HTTPException(status_code=403, detail=f"No permission: {perm}")
 
+def require_permission(perm: str):
+    async def dep(request: Request):
+        user = await _current_user(request)
+        check_permission(user, perm)
         return user
 
     return Depends(dep)
+
+
+def require_user():
+    """Любой активный пользователь; право проверяется в самом обработчике (check_permission)."""
+    return Depends(_current_user)
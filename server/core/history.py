@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pymongo import UpdateOne
+
+DAILY = "history_daily"
+
+# тип записи history -> поле дневной сводки (camera — знаковая разница остатка)
+ROLLUP_FIELDS = {"income": "income", "outcome": "outcome", "camera_update": "camera"}
+
+
+def day_start(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    ts = ts.astimezone(timezone.utc)
+    return datetime(ts.year, ts.month, ts.day, tzinfo=timezone.utc)
+
+
+def _rollup_ops(docs: List[Dict[str, Any]]) -> List[UpdateOne]:
+    per_key: Dict[Tuple[Any, Any, datetime], Dict[str, int]] = {}
+    for h in docs:
+        field = ROLLUP_FIELDS.get(h.get("type"))
+        if not field or not h.get("amount"):
+            continue
+        key = (h["warehouse_id"], h["item_id"], day_start(h["ts"]))
+        inc = per_key.setdefault(key, {})
+        inc[field] = inc.get(field, 0) + int(h["amount"])
+
+    return [
+        UpdateOne(
+            {"warehouse_id": wid, "item_id": iid, "day": day},
+            {"$inc": inc},
+            upsert=True,
+        )
+        for (wid, iid, day), inc in per_key.items()
+    ]
+
+
+async def write_history(db, docs: Union[Dict[str, Any], List[Dict[str, Any]]]) -> None:
+    """
+    Единая точка записи в history: вставка строк и $inc дневных сводок
+    history_daily (одна upsert-операция на товар и день).
+    """
+    if isinstance(docs, dict):
+        docs = [docs]
+    if not docs:
+        return
+
+    if len(docs) == 1:
+        await db["history"].insert_one(docs[0])
+    else:
+        await db["history"].insert_many(docs)
+
+    ops = _rollup_ops(docs)
+    if ops:
+        await db[DAILY].bulk_write(ops, ordered=False)
+
+
+async def backfill_history_daily(db, *, since: Optional[datetime] = None, replace: bool = False) -> None:
+    """
+    Пересобирает history_daily из сырой history одной агрегацией с $merge.
+
+    По умолчанию дополняет только отсутствующие (товар, день): сводки за дни,
+    строки которых уже удалены по сроку хранения, не затираются.
+    replace=True перезаписывает совпавшие дни (для явного пересчёта за период).
+    """
+    match: Dict[str, Any] = {"type": {"$in": list(ROLLUP_FIELDS)}, "deleted_at": None}
+    if since is not None:
+        match["ts"] = {"$gte": day_start(since)}
+
+    def _sum_of(htype: str) -> Dict[str, Any]:
+        return {"$sum": {"$cond": [{"$eq": ["$type", htype]}, "$amount", 0]}}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "warehouse_id": "$warehouse_id",
+                "item_id": "$item_id",
+                "day": {"$dateFromParts": {
+                    "year": {"$year": "$ts"},
+                    "month": {"$month": "$ts"},
+                    "day": {"$dayOfMonth": "$ts"},
+                }},
+            },
+            **{field: _sum_of(htype) for htype, field in ROLLUP_FIELDS.items()},
+        }},
+        {"$project": {
+            "_id": 0,
+            "warehouse_id": "$_id.warehouse_id",
+            "item_id": "$_id.item_id",
+            "day": "$_id.day",
+            **{field: 1 for field in ROLLUP_FIELDS.values()},
+        }},
+        {"$merge": {
+            "into": DAILY,
+            "on": ["warehouse_id", "item_id", "day"],
+            "whenMatched": "replace" if replace else "keepExisting",
+            "whenNotMatched": "insert",
+        }},
+    ]
+    async for _ in db["history"].aggregate(pipeline):
+        pass
+
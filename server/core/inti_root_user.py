@@ -4,6 +4,20 @@ from server.core.config import root_user_settings
 from server.core.functions.hash_utils import hash_password
 from fastapi import Request
 
+# индексы, которые перекрыты версиями с ("ts", -1), ("_id", -1) и только тормозят запись
+SUPERSEDED_INDEXES = {
+    "history": ["item_id_1_ts_-1", "warehouse_id_1_ts_-1"],
+}
+
+
+async def _drop_superseded_indexes(db):
+    for coll, names in SUPERSEDED_INDEXES.items():
+        existing = await db[coll].index_information()
+        for name in names:
+            if name in existing:
+                await db[coll].drop_index(name)
+
+
 async def init_root_user(log: bool = False):
     from server import app
     db = app.state.mongo_db
@@ -15,8 +29,28 @@ async def init_root_user(log: bool = False):
     await db["warehouses"].create_index([("camera_api_key", 1)], unique=True, sparse=True)
     await db["items"].create_index([("warehouse_id", 1)])
     await db["items"].create_index([("warehouse_id", 1), ("name", 1)], unique=True)
-    await db["history"].create_index([("item_id", 1), ("ts", -1)])
+    # _id в конце — стабильный порядок (ts, _id) для курсорной пагинации /history/query
+    await db["history"].create_index([("item_id", 1), ("ts", -1), ("_id", -1)])
+    await db["history"].create_index([("warehouse_id", 1), ("ts", -1), ("_id", -1)])
+    await db["history"].create_index([("warehouse_id", 1), ("type", 1), ("ts", -1), ("_id", -1)])
+    await db["history"].create_index([("warehouse_id", 1), ("by_user_id", 1), ("ts", -1), ("_id", -1)])
+    await _drop_superseded_indexes(db)
+    await db["stock_snapshots"].create_index([("warehouse_id", 1), ("taken_at", -1)])
+    await db["history_daily"].create_index([("warehouse_id", 1), ("item_id", 1), ("day", 1)], unique=True)
+    await db["history_daily"].create_index([("warehouse_id", 1), ("day", 1)])
+    await db["export_jobs"].create_index(
+        [("warehouse_id", 1), ("kind", 1), ("format", 1), ("gzip", 1), ("fingerprint", 1), ("created_at", -1)]
+    )
+    await db["export_jobs"].create_index([("company_id", 1), ("status", 1)])
+    await db["export_jobs"].create_index([("expire_at", 1)])
     await db["supplies"].create_index([("warehouse_id", 1), ("expected_at", 1)])
+    await db["supplies"].create_index([("warehouse_id", 1), ("status", 1), ("expected_at", 1)])
+    await db["supplies"].create_index([("warehouse_id", 1), ("item_id", 1), ("expected_at", 1)])
+    await db["company_stats"].create_index([("scope", 1), ("company_id", 1)])
+    await db["notifications"].create_index([("company_id", 1), ("last_at", -1)])
+    await db["notifications"].create_index(
+        [("company_id", 1), ("type", 1), ("item_id", 1), ("supply_id", 1), ("last_at", -1)]
+    )
 
     login = root_user_settings.LOGIN
     password = root_user_settings.PASSWORD
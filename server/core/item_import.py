@@ -0,0 +1,352 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import csv
+import tempfile
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from server.core.history import write_history
+from server.core.mailer import send_low_stock_summary_email
+from server.core.notifications import build_notification, create_notifications
+from server.core.stats import apply_stats_delta, item_stats_delta, merge_delta
+from server.routes.schemes import CreateItem
+
+IMPORT_BATCH = 500
+IMPORT_MAX_ROWS = 100_000
+IMPORT_MAX_BYTES = 50 * 1024 * 1024
+IMPORT_MAX_ERRORS = 1000
+IMPORT_EMAIL_MAX_ITEMS = 50  # строк в сводном письме о низком остатке
+XLSX_SPOOL_BYTES = 8 * 1024 * 1024  # больше — xlsx уходит во временный файл
+
+FIELDS = ("name", "category", "unit", "count", "low_limit")
+HEADER_ALIASES = {
+    "название": "name",
+    "наименование": "name",
+    "категория": "category",
+    "ед": "unit",
+    "единица": "unit",
+    "количество": "count",
+    "остаток": "count",
+    "порог": "low_limit",
+}
+
+
+async def _limited(chunks: AsyncIterator[bytes], report: Dict[str, Any]) -> AsyncIterator[bytes]:
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > IMPORT_MAX_BYTES:
+            report["truncated"] = True
+            return
+        yield chunk
+
+
+async def csv_records(chunks: AsyncIterator[bytes], report: Optional[Dict[str, Any]] = None) -> AsyncIterator[List[str]]:
+    """
+    CSV из потока байт по одной записи. Запись заканчивается на переводе строки
+    при чётном числе кавычек — так переносы внутри "..." не рвут строку.
+    Разделитель (',' или ';') определяется по заголовку.
+    Если поток оборван по лимиту (report["truncated"]), недочитанная последняя запись отбрасывается.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    delimiter: Optional[str] = None
+    pending: List[str] = []
+    quotes = 0
+    tail = ""
+
+    def _parse(record: str) -> List[str]:
+        nonlocal delimiter
+        if delimiter is None:
+            delimiter = ";" if record.count(";") > record.count(",") else ","
+        return next(csv.reader([record], delimiter=delimiter), [])
+
+    async for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            pending.append(line)
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                yield _parse("\n".join(pending))
+                pending = []
+                quotes = 0
+
+    if report and report.get("truncated"):
+        return
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        pending.append(tail)
+    if pending:
+        yield _parse("\n".join(pending))
+
+
+async def xlsx_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[Any]]:
+    """Строки первого листа xlsx. Zip читается только целиком, поэтому тело сперва спулится."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise HTTPException(501, "Импорт xlsx недоступен: на сервере не установлен openpyxl.")
+
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_BYTES) as f:
+        async for chunk in chunks:
+            await asyncio.to_thread(f.write, chunk)
+        f.seek(0)
+        try:
+            wb = await asyncio.to_thread(load_workbook, f, read_only=True, data_only=True)
+        except Exception:
+            raise HTTPException(400, "Не удалось прочитать xlsx-файл.")
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            while True:
+                batch = await asyncio.to_thread(lambda: list(islice(rows, IMPORT_BATCH)))
+                if not batch:
+                    break
+                for r in batch:
+                    yield list(r)
+        finally:
+            wb.close()
+
+
+def _cell(v: Any) -> Any:
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    v = str(v).strip()
+    return v or None
+
+
+def _header(row: List[Any]) -> Dict[int, str]:
+    out: Dict[int, str] = {}
+    for i, h in enumerate(row):
+        key = (_cell(h) or "").lower()
+        key = HEADER_ALIASES.get(key, key)
+        if key in FIELDS and key not in out.values():
+            out[i] = key
+    if "name" not in out.values():
+        raise HTTPException(400, "В первой строке файла нужен заголовок с колонкой name.")
+    return out
+
+
+def _error_text(e: ValidationError) -> List[str]:
+    out = []
+    for err in e.errors():
+        if err.get("type") == "missing":
+            out.append(f"{err['loc'][0]}: поле обязательно")
+        else:
+            out.append(str(err.get("msg", "")).removeprefix("Value error, "))
+    return out
+
+
+def _add_error(report: Dict[str, Any], row: int, errors: List[str]) -> None:
+    report["error_count"] += 1
+    if len(report["errors"]) < IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": row, "errors": errors})
+
+
+async def _apply_batch(
+    db,
+    wh,
+    batch: List[Tuple[int, CreateItem, Set[str]]],
+    *,
+    by_user_id,
+    report: Dict[str, Any],
+    low_stock: List[Tuple[str, int, int]],
+) -> None:
+    now = datetime.now(timezone.utc)
+    default_low = wh.get("low_stock_default", 1)
+    existing = {
+        it["name"]: it
+        async for it in db["items"].find({"warehouse_id": wh["_id"], "name": {"$in": [d.name for _, d, _ in batch]}})
+    }
+
+    ops: List[UpdateOne] = []
+    plan: List[Tuple[int, CreateItem, Optional[Dict[str, Any]], Dict[str, Any], int]] = []
+    for row, d, present in batch:
+        before = existing.get(d.name)
+        if before and before.get("deleted_at"):
+            _add_error(report, row, ["name: товар с таким названием удалён"])
+            continue
+
+        # у существующего товара меняются только колонки из файла, умолчания CreateItem — только новым
+        values = {"category": d.category, "unit": d.unit, "count": d.count, "low_limit": d.low_limit}
+        fields = {k: v for k, v in values.items() if k in present}
+        defaults = {k: v for k, v in values.items() if k not in present}
+        after = {**values, **(before or {}), **fields, "name": d.name}
+
+        low_limit = after["low_limit"] if after["low_limit"] is not None else default_low
+        if after["count"] > low_limit:
+            notified_at = None
+        else:
+            notified_at = (before or {}).get("low_notified_at") or now
+        after["low_notified_at"] = notified_at
+
+        ops.append(UpdateOne(
+            {"warehouse_id": wh["_id"], "name": d.name},
+            {
+                "$set": {**fields, "low_notified_at": notified_at, "updated_at": now},
+                "$setOnInsert": {**defaults, "created_at": now, "deleted_at": None},
+            },
+            upsert=True,
+        ))
+        plan.append((row, d, before, after, low_limit))
+
+    if not ops:
+        return
+
+    failed: Dict[int, str] = {}
+    try:
+        res = await db["items"].bulk_write(ops, ordered=False)
+        upserted = res.upserted_ids
+    except BulkWriteError as e:
+        failed = {w["index"]: w.get("errmsg", "") for w in e.details.get("writeErrors", [])}
+        upserted = {u["index"]: u["_id"] for u in e.details.get("upserted", [])}
+
+    stats: Dict[str, int] = {}
+    hist: List[Dict[str, Any]] = []
+    notes: List[Dict[str, Any]] = []
+    unit_changes: Dict[str, List[Any]] = {}
+
+    for i, (row, d, before, after, low_limit) in enumerate(plan):
+        if i in failed:
+            _add_error(report, row, ["name: товар с таким названием уже есть" if "E11000" in failed[i] else failed[i]])
+            continue
+
+        if i in upserted:
+            report["created"] += 1
+            after["_id"] = upserted[i]
+            stats = merge_delta(stats, item_stats_delta(None, after, default_low))
+            hist.append({
+                "item_id": after["_id"],
+                "item_name": d.name,
+                "unit": after["unit"],
+                "warehouse_id": wh["_id"],
+                "type": "income" if after["count"] > 0 else "create",
+                "amount": after["count"],
+                "ts": now,
+                "note": "Импорт",
+                "by_user_id": by_user_id,
+            })
+        else:
+            report["updated"] += 1
+            if before is None:
+                # товар создали параллельно между чтением и записью — прошлого остатка не знаем,
+                # счётчики поправит периодический пересчёт
+                continue
+            stats = merge_delta(stats, item_stats_delta(before, after, default_low))
+            delta = after["count"] - int(before.get("count", 0))
+            if delta:
+                hist.append({
+                    "item_id": before["_id"],
+                    "item_name": d.name,
+                    "unit": after["unit"],
+                    "warehouse_id": wh["_id"],
+                    "type": "income" if delta > 0 else "outcome",
+                    "amount": abs(delta),
+                    "ts": now,
+                    "note": "Импорт",
+                    "by_user_id": by_user_id,
+                })
+            if after["unit"] != before.get("unit"):
+                unit_changes.setdefault(after["unit"], []).append(before["_id"])
+
+        if after["low_notified_at"] == now:
+            low_stock.append((d.name, after["count"], low_limit))
+            notes.append(build_notification(
+                company_id=wh["company_id"],
+                warehouse_id=wh["_id"],
+                item_id=after["_id"],
+                ntype="low_stock",
+                title=f"Низкий остаток: {d.name}",
+                message=f"На складе «{wh['name']}» осталось {after['count']} {after['unit']}. Порог: {low_limit}.",
+                by_user_id=by_user_id,
+                now=now,
+            ))
+
+    for unit, ids in unit_changes.items():
+        for coll in ("history", "supplies"):
+            await db[coll].update_many({"item_id": {"$in": ids}}, {"$set": {"unit": unit, "updated_at": now}})
+
+    await write_history(db, hist)
+    await apply_stats_delta(db, wh, stats)
+    await create_notifications(db, notes)
+
+
+async def import_items(db, wh, fmt: str, chunks: AsyncIterator[bytes], *, by_user_id) -> Dict[str, Any]:
+    """
+    Потоковый импорт товаров склада из CSV/XLSX (первая строка — заголовок).
+    Строки проверяются правилами CreateItem и пишутся пачками по IMPORT_BATCH:
+    upsert по (warehouse_id, name), история и счётчики — одной записью на пачку.
+    Существующий товар получает остаток из файла, разница пишется в историю;
+    колонки, которых нет в файле (или пустые ячейки), у него не меняются.
+    О товарах, ушедших ниже порога, — уведомления и одно сводное письмо на весь импорт.
+    """
+    report: Dict[str, Any] = {
+        "rows": 0,
+        "created": 0,
+        "updated": 0,
+        "error_count": 0,
+        "errors": [],
+        "truncated": False,
+    }
+    body = _limited(chunks, report)
+    records = xlsx_records(body) if fmt == "xlsx" else csv_records(body, report)
+
+    header: Optional[Dict[int, str]] = None
+    seen: set = set()
+    batch: List[Tuple[int, CreateItem, Set[str]]] = []
+    row = 0
+    low_stock: List[Tuple[str, int, int]] = []
+
+    async for rec in records:
+        row += 1
+        values = [_cell(v) for v in rec]
+        if not any(values):
+            continue
+        if header is None:
+            header = _header(values)
+            continue
+
+        if report["rows"] >= IMPORT_MAX_ROWS:
+            report["truncated"] = True
+            break
+        report["rows"] += 1
+
+        data = {key: values[i] for i, key in header.items() if i < len(values) and values[i] is not None}
+        try:
+            item = CreateItem(warehouse_id=str(wh["_id"]), **data)
+        except ValidationError as e:
+            _add_error(report, row, _error_text(e))
+            continue
+        if item.name in seen:
+            _add_error(report, row, ["name: повтор названия в файле"])
+            continue
+        seen.add(item.name)
+
+        batch.append((row, item, set(data)))
+        if len(batch) >= IMPORT_BATCH:
+            await _apply_batch(db, wh, batch, by_user_id=by_user_id, report=report, low_stock=low_stock)
+            batch = []
+
+    if header is None:
+        raise HTTPException(400, "Файл пуст.")
+    if batch:
+        await _apply_batch(db, wh, batch, by_user_id=by_user_id, report=report, low_stock=low_stock)
+
+    if low_stock and wh.get("notification_emails"):
+        await send_low_stock_summary_email(
+            request_app=None,
+            to_list=wh["notification_emails"],
+            items=low_stock[:IMPORT_EMAIL_MAX_ITEMS],
+            total=len(low_stock),
+            warehouse_name=wh["name"],
+        )
+    return report
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Tuple
 from datetime import datetime, timezone
 import html as _html
 import logging
@@ -10,26 +10,16 @@ from server.core.config import settings
 logger = logging.getLogger("mailer")
 
 
-def _render_low_stock_html(
-    *,
-    item_name: str,
-    count: int,
-    low_limit: int,
-    warehouse_name: str,
-) -> str:
-    item_name_h = _html.escape(item_name or "—")
-    warehouse_h = _html.escape(warehouse_name or "—")
+def _layout_html(*, title: str, body: str) -> str:
     now_str = datetime.now(timezone.utc).astimezone().strftime("%d.%m.%Y %H:%M")
 
-    dashboard_url = f"https://{settings.DOMAIN}/"
-
     return f"""\
 <!doctype html>
 <html lang="ru">
   <head>
     <meta charset="utf-8"/>
     <meta name="viewport" content="width=device-width, initial-scale=1"/>
-    <title>Низкий остаток</title>
+    <title>{title}</title>
   </head>
   <body style="margin:0;padding:0;background:#0b0d14;color:#e7eaf6;font-family:system-ui,-apple-system,Segoe UI,Roboto,Arial;">
     <table role="presentation" width="100%" cellpadding="0" cellspacing="0" style="background:#0b0d14;padding:24px 0;">
@@ -54,6 +44,36 @@ def _render_low_stock_html(
               </td>
             </tr>
 
+{body}            <!-- Footer -->
+            <tr>
+              <td style="padding:14px 20px;border-top:1px solid #252b43;font-size:12px;color:#a8b0cf;">
+                Это автоматическое уведомление ASFES Warehouse System.<br/>
+                Если вы не ожидаете такие письма — проверьте настройки уведомлений склада.
+              </td>
+            </tr>
+
+          </table>
+        </td>
+      </tr>
+    </table>
+  </body>
+</html>
+"""
+
+
+def _render_low_stock_html(
+    *,
+    item_name: str,
+    count: int,
+    low_limit: int,
+    warehouse_name: str,
+) -> str:
+    item_name_h = _html.escape(item_name or "—")
+    warehouse_h = _html.escape(warehouse_name or "—")
+
+    dashboard_url = f"https://{settings.DOMAIN}/"
+
+    body = f"""\
             <!-- Body -->
             <tr>
               <td style="padding:20px;">
@@ -114,21 +134,74 @@ def _render_low_stock_html(
               </td>
             </tr>
 
-            <!-- Footer -->
+"""
+    return _layout_html(title="Низкий остаток", body=body)
+
+
+def _render_low_stock_summary_html(
+    *,
+    items: List[Tuple[str, int, int]],
+    total: int,
+    warehouse_name: str,
+) -> str:
+    warehouse_h = _html.escape(warehouse_name or "—")
+    dashboard_url = f"https://{settings.DOMAIN}/"
+
+    rows = "".join(
+        f"""\
+                  <tr>
+                    <td style="padding:8px 16px;font-size:14px;font-weight:700;">{_html.escape(name or "—")}</td>
+                    <td align="right" style="padding:8px 16px;font-size:14px;font-weight:800;color:#ff5c7a;">{count}</td>
+                    <td align="right" style="padding:8px 16px;font-size:14px;color:#a8b0cf;">{low_limit}</td>
+                  </tr>
+"""
+        for name, count, low_limit in items
+    )
+    more = ""
+    if total > len(items):
+        more = f"""\
+                <div style="font-size:13px;color:#a8b0cf;margin-top:8px;">и ещё {total - len(items)} — полный список на дашборде</div>
+"""
+
+    body = f"""\
+            <!-- Body -->
             <tr>
-              <td style="padding:14px 20px;border-top:1px solid #252b43;font-size:12px;color:#a8b0cf;">
-                Это автоматическое уведомление ASFES Warehouse System.<br/>
-                Если вы не ожидаете такие письма — проверьте настройки уведомлений склада.
+              <td style="padding:20px;">
+                <div style="font-size:20px;font-weight:800;margin-bottom:6px;">
+                  Низкий остаток после импорта
+                </div>
+
+                <div style="color:#a8b0cf;font-size:14px;margin-bottom:14px;">
+                  На складе <b style="color:#e7eaf6;">{warehouse_h}</b>
+                  остаток ниже порога у {total} товаров.
+                </div>
+
+                <table role="presentation" width="100%" cellpadding="0" cellspacing="0"
+                       style="background:#0f1326;border:1px solid #252b43;border-radius:14px;">
+                  <tr>
+                    <td style="padding:10px 16px 4px;font-size:12px;color:#a8b0cf;">Товар</td>
+                    <td align="right" style="padding:10px 16px 4px;font-size:12px;color:#a8b0cf;">Количество</td>
+                    <td align="right" style="padding:10px 16px 4px;font-size:12px;color:#a8b0cf;">Порог</td>
+                  </tr>
+{rows}                </table>
+{more}
+                <div style="height:18px;"></div>
+
+                <table role="presentation" cellpadding="0" cellspacing="0">
+                  <tr>
+                    <td align="center" style="background:#7b61ff;border-radius:10px;">
+                      <a href="{dashboard_url}"
+                         style="display:inline-block;padding:10px 14px;color:#ffffff;text-decoration:none;font-weight:700;font-size:14px;">
+                        Открыть дашборд
+                      </a>
+                    </td>
+                  </tr>
+                </table>
               </td>
             </tr>
 
-          </table>
-        </td>
-      </tr>
-    </table>
-  </body>
-</html>
 """
+    return _layout_html(title="Низкий остаток", body=body)
 
 
 async def send_low_stock_email(
@@ -166,3 +239,32 @@ async def send_low_stock_email(
         await client.send(msg)
     except Exception as e:
         logger.exception("send_low_stock_email failed: %r", e)
+
+
+async def send_low_stock_summary_email(
+    request_app,
+    to_list: List[str],
+    items: List[Tuple[str, int, int]],
+    total: int,
+    warehouse_name: str,
+):
+    """Одно письмо на массовую операцию: items — (название, остаток, порог), total — сколько их всего."""
+    if request_app is None:
+        from server import app as request_app
+
+    mailcfg = request_app.state.mailcfg
+
+    from asfeslib.net.mail import MailClient, MailMessage
+
+    msg = MailMessage(
+        to=to_list,
+        subject=f"Низкий остаток: {total} товаров на складе «{warehouse_name}»",
+        body=_render_low_stock_summary_html(items=items, total=total, warehouse_name=warehouse_name),
+        html=True,
+    )
+
+    client = MailClient(mailcfg)
+    try:
+        await client.send(msg)
+    except Exception as e:
+        logger.exception("send_low_stock_summary_email failed: %r", e)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict
+
+from server.core.history import backfill_history_daily
+
+META = "meta"
+
+
+async def run_once(db, name: str, job: Callable[[], Awaitable[Any]]) -> bool:
+    """Выполняет job один раз на базу: отметка {_id: name} в коллекции meta."""
+    if await db[META].find_one({"_id": name}):
+        return False
+    await job()
+    await db[META].update_one(
+        {"_id": name},
+        {"$set": {"done_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    return True
+
+
+def _item_fields_pipeline(coll: str) -> list:
+    # $merge в ту же коллекцию по _id: только дописывает поля, строки не переносятся в приложение
+    return [
+        {"$match": {"item_name": {"$exists": False}}},
+        {"$lookup": {"from": "items", "localField": "item_id", "foreignField": "_id", "as": "_item"}},
+        {"$project": {
+            "item_name": {"$ifNull": [{"$arrayElemAt": ["$_item.name", 0]}, "—"]},
+            "unit": {"$ifNull": [{"$arrayElemAt": ["$_item.unit", 0]}, ""]},
+        }},
+        {"$merge": {"into": coll, "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]
+
+
+async def backfill_item_names(db) -> None:
+    """Денормализация item_name / unit в history и supplies для старых документов."""
+    for coll in ("history", "supplies"):
+        async for _ in db[coll].aggregate(_item_fields_pipeline(coll)):
+            pass
+
+
+async def set_notifications_read_until(db) -> None:
+    """
+    Общий флаг read у уведомлений заменён отметкой на пользователя: всё, что было
+    до выката, считаем прочитанным, иначе старые уведомления снова станут новыми.
+    """
+    await db["users"].update_many(
+        {"notifications_read_until": {"$exists": False}},
+        {"$set": {"notifications_read_until": datetime.now(timezone.utc)}},
+    )
+
+
+async def run_migrations(db) -> Dict[str, bool]:
+    return {
+        "history_daily_backfill": await run_once(db, "history_daily_backfill", lambda: backfill_history_daily(db)),
+        "item_names_denormalized": await run_once(db, "item_names_denormalized", lambda: backfill_item_names(db)),
+        "notifications_read_watermark": await run_once(
+            db, "notifications_read_watermark", lambda: set_notifications_read_until(db),
+        ),
+    }
@@ -1,13 +1,42 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone
-from typing import Any, Optional, Dict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Dict, List
 
+from pymongo import ReturnDocument
+
+from server.core.config import settings
 from server.core.db_utils import oid, public_id
 
+# Окно склейки по типу, сек: повторное событие того же типа по тому же товару/поставке
+# внутри окна обновляет существующее уведомление (count, last_at, текст) вместо вставки.
+COALESCE_SEC: Dict[str, int] = {
+    "low_stock": 24 * 3600,
+    "supply_status": 3600,
+}
 
-async def create_notification(
-    db,
+
+def _maybe_oid(x):
+    if x is None:
+        return None
+    if isinstance(x, str):
+        try:
+            return oid(x)
+        except Exception:
+            return x
+    return x
+
+
+def notification_ttl_days(ntype: str) -> int:
+    return settings.NOTIFICATION_TTL_DAYS_BY_TYPE.get(ntype, settings.NOTIFICATION_TTL_DAYS)
+
+
+def notification_expire_at(ntype: str, at: datetime) -> Optional[datetime]:
+    days = notification_ttl_days(ntype)
+    return at + timedelta(days=days) if days > 0 else None
+
+
+def build_notification(
     *,
     company_id: Any,
     title: str,
@@ -17,20 +46,10 @@ async def create_notification(
     supply_id: Optional[Any] = None,
     item_id: Optional[Any] = None,
     by_user_id: Optional[Any] = None,
-):
-    now = datetime.now(timezone.utc)
-
-    def _maybe_oid(x):
-        if x is None:
-            return None
-        if isinstance(x, str):
-            try:
-                return oid(x)
-            except Exception:
-                return x
-        return x
-
-    doc: Dict[str, Any] = {
+    now: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    now = now or datetime.now(timezone.utc)
+    return {
         "company_id": _maybe_oid(company_id),
         "warehouse_id": _maybe_oid(warehouse_id),
         "supply_id": _maybe_oid(supply_id),
@@ -38,11 +57,88 @@ async def create_notification(
         "type": ntype,
         "title": title,
         "message": message,
-        "read": False,
         "created_at": now,
+        "last_at": now,
+        "count": 1,
         "by_user_id": _maybe_oid(by_user_id),
-        "read_at": None,
-        "read_by_user_id": None,
+        "read_by": [],
+        "expire_at": notification_expire_at(ntype, now),
     }
+
+
+async def create_notification(
+    db,
+    *,
+    company_id: Any,
+    title: str,
+    message: str,
+    ntype: str = "info",
+    warehouse_id: Optional[Any] = None,
+    supply_id: Optional[Any] = None,
+    item_id: Optional[Any] = None,
+    by_user_id: Optional[Any] = None,
+    coalesce_sec: Optional[int] = None,
+):
+    """
+    Создаёт уведомление или склеивает его с недавним таким же
+    (окно — coalesce_sec, по умолчанию COALESCE_SEC[ntype]).
+    Склеенное уведомление снова становится непрочитанным для всех.
+    """
+    doc = build_notification(
+        company_id=company_id,
+        title=title,
+        message=message,
+        ntype=ntype,
+        warehouse_id=warehouse_id,
+        supply_id=supply_id,
+        item_id=item_id,
+        by_user_id=by_user_id,
+    )
+
+    window = COALESCE_SEC.get(ntype, 0) if coalesce_sec is None else coalesce_sec
+    if window > 0 and (doc["item_id"] or doc["supply_id"]):
+        now = doc["last_at"]
+        merged = await db["notifications"].find_one_and_update(
+            {
+                "company_id": doc["company_id"],
+                "type": ntype,
+                "item_id": doc["item_id"],
+                "supply_id": doc["supply_id"],
+                "last_at": {"$gte": now - timedelta(seconds=window)},
+            },
+            {
+                "$inc": {"count": 1},
+                "$set": {
+                    "title": title,
+                    "message": message,
+                    "last_at": now,
+                    "by_user_id": doc["by_user_id"],
+                    "read_by": [],
+                    "expire_at": doc["expire_at"],
+                },
+            },
+            sort=[("last_at", -1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if merged:
+            return public_id(merged)
+
     _id = (await db["notifications"].insert_one(doc)).inserted_id
-    return public_id({**doc, "_id": _id})
\ No newline at end of file
+    return public_id({**doc, "_id": _id})
+
+
+async def create_notifications(db, docs: List[Dict[str, Any]]) -> int:
+    """Вставка пачки документов из build_notification одним insert_many."""
+    if not docs:
+        return 0
+    res = await db["notifications"].insert_many(docs, ordered=False)
+    return len(res.inserted_ids)
+
+
+async def migrate_notifications(db) -> int:
+    """Старые уведомления без last_at/count: last_at = created_at, count = 1."""
+    res = await db["notifications"].update_many(
+        {"last_at": {"$exists": False}},
+        [{"$set": {"last_at": "$created_at", "count": 1}}],
+    )
+    return res.modified_count
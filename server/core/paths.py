@@ -38,7 +38,7 @@ def _mkdir(path: Path) -> Path:
     return path
 
 
-_WRITABLE_SUBDIRS: Final[List[str]] = ["db", "logs"]
+_WRITABLE_SUBDIRS: Final[List[str]] = ["db", "logs", "exports"]
 
 for sub in _WRITABLE_SUBDIRS:
     _mkdir(DATA_ROOT / sub)
@@ -46,6 +46,7 @@ for sub in _WRITABLE_SUBDIRS:
 
 DB_DIR: Final = DATA_ROOT / "db"
 LOG_DIR: Final = DATA_ROOT / "logs"
+EXPORTS_DIR: Final = DATA_ROOT / "exports"
 
 TEMPLATES_DIR: Final = BASE_DIR / "templates"
 STATIC_DIR: Final = BASE_DIR / "static"
@@ -53,6 +54,6 @@ STATIC_DIR: Final = BASE_DIR / "static"
 __all__ = [
     "IS_WINDOWS", "IN_GITHUB_ACTIONS",
     "BASE_DIR",
-    "DB_DIR", "LOG_DIR",
+    "DB_DIR", "LOG_DIR", "EXPORTS_DIR",
     "TEMPLATES_DIR", "STATIC_DIR"
 ]
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from server.core.config import settings
+from server.core.migrations import META
+
+DAY_MS = 24 * 3600 * 1000
+
+
+async def ensure_ttl_index(
+    db,
+    coll: str,
+    field: str,
+    expire_after_sec: Optional[int],
+    *,
+    name: str,
+    partial: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Приводит TTL-индекс к нужному сроку: создаёт, меняет срок через collMod
+    или удаляет (expire_after_sec=None — хранить вечно).
+    """
+    existing = (await db[coll].index_information()).get(name)
+
+    if expire_after_sec is None:
+        if existing:
+            await db[coll].drop_index(name)
+            return "dropped"
+        return "off"
+
+    if existing:
+        if existing.get("expireAfterSeconds") == expire_after_sec:
+            return "ok"
+        await db.command("collMod", coll, index={"name": name, "expireAfterSeconds": expire_after_sec})
+        return "updated"
+
+    opts: Dict[str, Any] = {"name": name, "expireAfterSeconds": expire_after_sec}
+    if partial:
+        opts["partialFilterExpression"] = partial
+    await db[coll].create_index([(field, 1)], **opts)
+    return "created"
+
+
+NOTIFICATION_RETENTION = "notification_retention"
+
+
+def _notification_groups(by_type: Dict[str, int], default: int, types) -> Dict[str, Any]:
+    # тип -> срок; "*" — все остальные типы
+    out: Dict[str, Any] = {t: by_type.get(t, default) for t in types}
+    out["*"] = default
+    return out
+
+
+async def _sync_notification_expiry(db) -> int:
+    """
+    Приводит expire_at уже сохранённых уведомлений к текущим срокам.
+
+    Применённые сроки хранятся в meta; при старте пересчитываются только группы
+    (тип или «остальные»), у которых срок изменился: expire_at = last_at + срок,
+    а при сроке 0 expire_at снимается — такие уведомления TTL-индекс больше не тронет.
+    """
+    by_type = {t: int(d) for t, d in settings.NOTIFICATION_TTL_DAYS_BY_TYPE.items()}
+    default = settings.NOTIFICATION_TTL_DAYS
+
+    prev = await db[META].find_one({"_id": NOTIFICATION_RETENTION})
+    prev_by_type: Dict[str, int] = (prev or {}).get("by_type", {})
+    prev_default: Optional[int] = (prev or {}).get("default")
+
+    types = sorted(set(by_type) | set(prev_by_type))
+    cur = _notification_groups(by_type, default, types)
+    old = _notification_groups(prev_by_type, prev_default, types) if prev else {}
+
+    modified = 0
+    for group, days in cur.items():
+        if prev and old.get(group) == days:
+            continue
+        q: Dict[str, Any] = {"type": {"$nin": types}} if group == "*" else {"type": group}
+        if days <= 0:
+            res = await db["notifications"].update_many(
+                {**q, "expire_at": {"$ne": None}},
+                {"$unset": {"expire_at": ""}},
+            )
+        else:
+            res = await db["notifications"].update_many(
+                q,
+                [{"$set": {"expire_at": {"$add": [{"$ifNull": ["$last_at", "$created_at"]}, days * DAY_MS]}}}],
+            )
+        modified += res.modified_count
+
+    await db[META].update_one(
+        {"_id": NOTIFICATION_RETENTION},
+        {"$set": {"by_type": by_type, "default": default}},
+        upsert=True,
+    )
+    return modified
+
+
+async def ensure_retention(db) -> Dict[str, Any]:
+    """
+    Политика хранения:
+    - notifications: удаляются по expire_at (срок на тип, см. NOTIFICATION_TTL_DAYS*);
+    - history: строки camera_update старше CAMERA_HISTORY_TTL_DAYS удаляются частичным TTL-индексом,
+      но только после того, как history_daily собран из сырой history (иначе они пропадут несвёрнутыми);
+    - stock_snapshots: старше STOCK_SNAPSHOT_TTL_DAYS.
+    """
+    camera_days = settings.CAMERA_HISTORY_TTL_DAYS
+    snapshot_days = settings.STOCK_SNAPSHOT_TTL_DAYS
+    if camera_days > 0 and not await db[META].find_one({"_id": "history_daily_backfill"}):
+        camera_days = 0
+    return {
+        "notifications": await ensure_ttl_index(db, "notifications", "expire_at", 0, name="notifications_expire_at"),
+        "notifications_synced": await _sync_notification_expiry(db),
+        "history_camera": await ensure_ttl_index(
+            db,
+            "history",
+            "ts",
+            camera_days * 24 * 3600 if camera_days > 0 else None,
+            name="history_camera_update_ttl",
+            partial={"type": "camera_update"},
+        ),
+        "stock_snapshots": await ensure_ttl_index(
+            db,
+            "stock_snapshots",
+            "taken_at",
+            snapshot_days * 24 * 3600 if snapshot_days > 0 else None,
+            name="stock_snapshots_ttl",
+        ),
+    }
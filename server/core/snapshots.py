@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from server.core.config import settings
+
+SNAPSHOTS = "stock_snapshots"
+
+# типы history, меняющие остаток: outcome вычитается, остальные прибавляются со своим знаком
+LEDGER_TYPES = ["create", "income", "outcome", "camera_update"]
+
+
+def _aware(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+async def take_stock_snapshots(db, *, min_age_sec: float = 0) -> int:
+    """
+    Снимок остатков всех живых складов (один документ на склад).
+    min_age_sec — пропустить, если последний снимок свежее (например, после рестарта).
+    """
+    now = datetime.now(timezone.utc)
+    if min_age_sec > 0:
+        last = await db[SNAPSHOTS].find_one({}, {"taken_at": 1}, sort=[("taken_at", -1)])
+        if last and now - _aware(last["taken_at"]) < timedelta(seconds=min_age_sec):
+            return 0
+
+    warehouses = {
+        w["_id"]: w["company_id"]
+        async for w in db["warehouses"].find({"deleted_at": None}, {"company_id": 1})
+    }
+    if not warehouses:
+        return 0
+
+    counts: Dict[Any, List[Dict[str, Any]]] = {wid: [] for wid in warehouses}
+    async for it in db["items"].find(
+        {"warehouse_id": {"$in": list(warehouses)}, "deleted_at": None},
+        {"warehouse_id": 1, "count": 1},
+    ):
+        counts[it["warehouse_id"]].append({"item_id": it["_id"], "count": int(it.get("count", 0))})
+
+    docs = [
+        {"warehouse_id": wid, "company_id": warehouses[wid], "taken_at": now, "items": rows}
+        for wid, rows in counts.items()
+    ]
+    await db[SNAPSHOTS].insert_many(docs, ordered=False)
+    return len(docs)
+
+
+async def _ledger_deltas(db, warehouse_id, lo: datetime, hi: datetime, item_id=None):
+    """Сумма изменений остатка по товарам за (lo, hi] из history."""
+    match: Dict[str, Any] = {
+        "warehouse_id": warehouse_id,
+        "ts": {"$gt": lo, "$lte": hi},
+        "type": {"$in": LEDGER_TYPES},
+        "deleted_at": None,
+    }
+    if item_id is not None:
+        match["item_id"] = item_id
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$item_id",
+            "delta": {"$sum": {"$cond": [
+                {"$eq": ["$type", "outcome"]},
+                {"$multiply": [-1, "$amount"]},
+                "$amount",
+            ]}},
+            "rows": {"$sum": 1},
+        }},
+    ]
+    deltas: Dict[Any, int] = {}
+    rows = 0
+    async for g in db["history"].aggregate(pipeline):
+        deltas[g["_id"]] = int(g["delta"] or 0)
+        rows += g["rows"]
+    return deltas, rows
+
+
+async def stock_as_of(db, wh: Dict[str, Any], at: datetime, *, item_id=None) -> Dict[str, Any]:
+    """
+    Остатки склада на момент at.
+
+    Опорная точка — ближайший к at снимок (до или после) либо текущие остатки,
+    от неё проигрывается только разница по history: вперёд, если опора раньше at,
+    и назад, если позже. Стоимость зависит от активности между опорой и at,
+    а не от возраста товаров.
+
+    Строки camera_update старше CAMERA_HISTORY_TTL_DAYS удаляются, поэтому опора
+    выбирается так, чтобы проигрываемый отрезок целиком лежал после этого горизонта.
+    Если такой опоры нет, берётся ближайшая, а ответ помечается complete=False.
+    """
+    at = _aware(at)
+    now = datetime.now(timezone.utc)
+    at = min(at, now)
+
+    q: Dict[str, Any] = {"warehouse_id": wh["_id"]}
+    before = await db[SNAPSHOTS].find_one({**q, "taken_at": {"$lte": at}}, sort=[("taken_at", -1)])
+    after = await db[SNAPSHOTS].find_one({**q, "taken_at": {"$gt": at}}, sort=[("taken_at", 1)])
+
+    # кандидаты: (расстояние до at, вид, момент, остатки или None — текущие)
+    candidates = [(now - at, "live", now, None)]
+    if before:
+        taken = _aware(before["taken_at"])
+        candidates.append((at - taken, "snapshot", taken, before["items"]))
+    if after:
+        taken = _aware(after["taken_at"])
+        candidates.append((taken - at, "snapshot", taken, after["items"]))
+
+    # начиная с horizon строки camera_update ещё не удалены
+    camera_days = settings.CAMERA_HISTORY_TTL_DAYS
+    horizon = now - timedelta(days=camera_days) if camera_days > 0 else None
+    safe = [c for c in candidates if horizon is None or c[2] == at or min(c[2], at) >= horizon]
+    complete = bool(safe)
+    _, kind, base_at, base_rows = min(safe or candidates, key=lambda c: c[0])
+
+    item_q: Dict[str, Any] = {"warehouse_id": wh["_id"], "deleted_at": None}
+    if item_id is not None:
+        item_q["_id"] = item_id
+    items = {
+        it["_id"]: it
+        async for it in db["items"].find(item_q, {"name": 1, "unit": 1, "count": 1, "created_at": 1})
+    }
+
+    if base_rows is None:
+        base = {iid: int(it.get("count", 0)) for iid, it in items.items()}
+    else:
+        base = {r["item_id"]: int(r["count"]) for r in base_rows if r["item_id"] in items}
+
+    if base_at <= at:
+        deltas, replayed = await _ledger_deltas(db, wh["_id"], base_at, at, item_id)
+        sign = 1
+    else:
+        deltas, replayed = await _ledger_deltas(db, wh["_id"], at, base_at, item_id)
+        sign = -1
+
+    out = []
+    for iid, it in items.items():
+        created = _aware(it.get("created_at"))
+        if created and created > at:
+            continue
+        count = base.get(iid, 0) + sign * deltas.get(iid, 0)
+        out.append({"item_id": iid, "name": it.get("name"), "unit": it.get("unit"), "count": count})
+    out.sort(key=lambda r: r["name"] or "")
+
+    return {
+        "at": at,
+        "base": {"kind": kind, "taken_at": base_at},
+        "replayed": replayed,
+        "complete": complete,
+        "history_horizon": horizon,
+        "items": out,
+    }
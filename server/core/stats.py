@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+STATS = "company_stats"
+SUPPLY_STATUSES = ("waiting", "done", "canceled")
+
+# Счётчики хранятся тремя уровнями: склад, компания, все компании (для root).
+# Каждая запись в items/supplies шлёт одну $inc-дельту сразу во все три документа,
+# периодический rebuild_stats пересчитывает их с нуля и убирает накопленный дрейф.
+
+
+def stats_key(scope: str, _id: Any = None) -> str:
+    return scope if _id is None else f"{scope}:{_id}"
+
+
+def encode_category(name: Optional[str]) -> str:
+    # ключи документа Mongo не могут содержать "." и начинаться с "$"
+    return (name or "other").replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def decode_category(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+
+def _is_low(item: Dict[str, Any], default_low: int) -> bool:
+    low = item.get("low_limit")
+    if low is None:
+        low = default_low
+    return int(item.get("count", 0)) <= int(low)
+
+
+def _add(acc: Dict[str, int], key: str, n: int) -> None:
+    acc[key] = acc.get(key, 0) + n
+
+
+def merge_delta(acc: Dict[str, int], delta: Dict[str, int]) -> Dict[str, int]:
+    for k, v in delta.items():
+        _add(acc, k, v)
+    return {k: v for k, v in acc.items() if v}
+
+
+def item_stats_delta(
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+    default_low: int = 1,
+) -> Dict[str, int]:
+    """
+    Дельта счётчиков по состоянию товара до и после записи.
+    None (или удалённый товар) — товара нет.
+    """
+    inc: Dict[str, int] = {}
+    for doc, sign in ((before, -1), (after, 1)):
+        if not doc or doc.get("deleted_at"):
+            continue
+        _add(inc, "items", sign)
+        _add(inc, "stock", sign * int(doc.get("count", 0)))
+        if _is_low(doc, default_low):
+            _add(inc, "low", sign)
+        _add(inc, f"categories.{encode_category(doc.get('category'))}", sign)
+    return {k: v for k, v in inc.items() if v}
+
+
+def supply_stats_delta(before: Optional[str], after: Optional[str]) -> Dict[str, int]:
+    """Дельта счётчиков по статусу поставки до и после записи."""
+    inc: Dict[str, int] = {}
+    if before in SUPPLY_STATUSES:
+        _add(inc, f"supplies.{before}", -1)
+    if after in SUPPLY_STATUSES:
+        _add(inc, f"supplies.{after}", 1)
+    return {k: v for k, v in inc.items() if v}
+
+
+def _inc_ops(wh: Dict[str, Any], inc: Dict[str, int], now: datetime) -> List[UpdateOne]:
+    targets = (
+        (stats_key("warehouse", wh["_id"]), {"scope": "warehouse", "company_id": wh["company_id"], "warehouse_id": wh["_id"]}),
+        (stats_key("company", wh["company_id"]), {"scope": "company", "company_id": wh["company_id"]}),
+        (stats_key("global"), {"scope": "global"}),
+    )
+    return [
+        UpdateOne(
+            {"_id": key},
+            {"$inc": inc, "$set": {"updated_at": now}, "$setOnInsert": meta},
+            upsert=True,
+        )
+        for key, meta in targets
+    ]
+
+
+async def apply_stats_delta(db, wh: Dict[str, Any], inc: Dict[str, int]) -> None:
+    """Применяет дельту к счётчикам склада, его компании и глобальным одним bulk_write."""
+    if not inc:
+        return
+    await db[STATS].bulk_write(_inc_ops(wh, inc, datetime.now(timezone.utc)), ordered=False)
+
+
+def _flat(doc: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    if not doc:
+        return {}
+    out = {k: int(doc.get(k, 0)) for k in ("items", "stock", "low")}
+    for k, v in (doc.get("categories") or {}).items():
+        out[f"categories.{k}"] = int(v)
+    for k, v in (doc.get("supplies") or {}).items():
+        out[f"supplies.{k}"] = int(v)
+    return {k: v for k, v in out.items() if v}
+
+
+def _unflat(flat: Dict[str, int]) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {"items": 0, "stock": 0, "low": 0, "categories": {}, "supplies": {s: 0 for s in SUPPLY_STATUSES}}
+    for k, v in flat.items():
+        if "." in k:
+            head, tail = k.split(".", 1)
+            doc[head][tail] = v
+        else:
+            doc[k] = v
+    return doc
+
+
+async def _compute(db, warehouses: Iterable[Dict[str, Any]]) -> Dict[Any, Dict[str, int]]:
+    """Считает счётчики заданных складов с нуля (по одной агрегации на items и supplies)."""
+    out: Dict[Any, Dict[str, int]] = {w["_id"]: {} for w in warehouses}
+    if not out:
+        return out
+    wh_ids = list(out)
+
+    items_pipeline = [
+        {"$match": {"warehouse_id": {"$in": wh_ids}, "deleted_at": None}},
+        {"$project": {"warehouse_id": 1, "category": 1, "count": 1, "low_limit": 1}},
+        {"$lookup": {"from": "warehouses", "localField": "warehouse_id", "foreignField": "_id", "as": "_wh"}},
+        {"$set": {"_low": {"$ifNull": [
+            "$low_limit",
+            {"$ifNull": [{"$arrayElemAt": ["$_wh.low_stock_default", 0]}, 1]},
+        ]}}},
+        {"$group": {
+            "_id": {"w": "$warehouse_id", "c": "$category"},
+            "n": {"$sum": 1},
+            "stock": {"$sum": {"$ifNull": ["$count", 0]}},
+            "low": {"$sum": {"$cond": [{"$lte": [{"$ifNull": ["$count", 0]}, "$_low"]}, 1, 0]}},
+        }},
+    ]
+    async for g in db["items"].aggregate(items_pipeline):
+        acc = out[g["_id"]["w"]]
+        _add(acc, "items", g["n"])
+        _add(acc, "stock", int(g["stock"]))
+        _add(acc, "low", g["low"])
+        _add(acc, f"categories.{encode_category(g['_id'].get('c'))}", g["n"])
+
+    supplies_pipeline = [
+        {"$match": {"warehouse_id": {"$in": wh_ids}, "status": {"$in": list(SUPPLY_STATUSES)}}},
+        {"$group": {"_id": {"w": "$warehouse_id", "s": "$status"}, "n": {"$sum": 1}}},
+    ]
+    async for g in db["supplies"].aggregate(supplies_pipeline):
+        _add(out[g["_id"]["w"]], f"supplies.{g['_id']['s']}", g["n"])
+
+    return {wid: {k: v for k, v in acc.items() if v} for wid, acc in out.items()}
+
+
+async def rebuild_warehouse_stats(db, wh: Dict[str, Any]) -> None:
+    """
+    Пересчитывает счётчики одного склада (например, после смены порога low-stock)
+    и переносит разницу на компанию и глобальный документ.
+    """
+    fresh = (await _compute(db, [wh]))[wh["_id"]]
+    old = _flat(await db[STATS].find_one({"_id": stats_key("warehouse", wh["_id"])}))
+    diff = merge_delta({k: -v for k, v in old.items()}, fresh)
+    await apply_stats_delta(db, wh, diff)
+
+
+async def drop_warehouse_stats(db, wh: Dict[str, Any]) -> None:
+    """Вычитает счётчики удалённого склада из компании и глобального документа."""
+    old = await db[STATS].find_one_and_delete({"_id": stats_key("warehouse", wh["_id"])})
+    diff = {k: -v for k, v in _flat(old).items()}
+    if diff:
+        now = datetime.now(timezone.utc)
+        await db[STATS].bulk_write(_inc_ops(wh, diff, now)[1:], ordered=False)
+
+
+async def drop_company_stats(db, company_id) -> None:
+    """Вычитает счётчики удалённой компании из глобального документа."""
+    old = await db[STATS].find_one_and_delete({"_id": stats_key("company", company_id)})
+    await db[STATS].delete_many({"scope": "warehouse", "company_id": company_id})
+    diff = {k: -v for k, v in _flat(old).items()}
+    if diff:
+        await db[STATS].update_one(
+            {"_id": stats_key("global")},
+            {"$inc": diff, "$set": {"updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+
+
+async def rebuild_stats(db) -> Dict[str, int]:
+    """
+    Полный пересчёт всех счётчиков с нуля.
+
+    Инкременты, пришедшие между подсчётом и записью, теряются до следующего
+    прохода — для счётчиков дашборда это допустимо.
+    """
+    warehouses = [
+        w async for w in db["warehouses"].find(
+            {"deleted_at": None}, {"company_id": 1, "low_stock_default": 1}
+        )
+    ]
+    per_wh = await _compute(db, warehouses)
+    now = datetime.now(timezone.utc)
+
+    per_company: Dict[Any, Dict[str, int]] = {}
+    total: Dict[str, int] = {}
+    ops: List[Any] = []
+    keep: List[str] = [stats_key("global")]
+
+    for w in warehouses:
+        flat = per_wh[w["_id"]]
+        merge_delta(per_company.setdefault(w["company_id"], {}), flat)
+        merge_delta(total, flat)
+
+        key = stats_key("warehouse", w["_id"])
+        keep.append(key)
+        ops.append(ReplaceOne(
+            {"_id": key},
+            {"scope": "warehouse", "company_id": w["company_id"], "warehouse_id": w["_id"], **_unflat(flat), "updated_at": now},
+            upsert=True,
+        ))
+
+    for cid, flat in per_company.items():
+        key = stats_key("company", cid)
+        keep.append(key)
+        ops.append(ReplaceOne(
+            {"_id": key},
+            {"scope": "company", "company_id": cid, **_unflat(flat), "updated_at": now},
+            upsert=True,
+        ))
+
+    ops.append(ReplaceOne(
+        {"_id": stats_key("global")},
+        {"scope": "global", **_unflat(total), "updated_at": now},
+        upsert=True,
+    ))
+    ops.append(DeleteMany({"_id": {"$nin": keep}}))
+
+    await db[STATS].bulk_write(ops, ordered=False)
+    return {"warehouses": len(warehouses), "companies": len(per_company)}
+
+
+async def read_stats(db, company_id=None) -> Dict[str, Any]:
+    """Счётчики компании (или всех компаний при company_id=None) одной точечной выборкой."""
+    key = stats_key("global") if company_id is None else stats_key("company", company_id)
+    doc = _unflat(_flat(await db[STATS].find_one({"_id": key})))
+    doc["categories"] = {decode_category(k): v for k, v in doc["categories"].items() if v}
+    return doc
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+
+from server.core.notifications import build_notification, create_notifications
+
+
+async def sweep_overdue_supplies(db, *, now: Optional[datetime] = None) -> int:
+    """
+    Помечает просроченные waiting-поставки и создаёт по ним уведомления.
+
+    Поставки забираются одним update_many с уникальной меткой прохода, поэтому
+    два воркера не уведомят об одной поставке дважды. Фильтр идёт по
+    (warehouse_id, expected_at) — индекс supplies уже есть.
+    """
+    now = now or datetime.now(timezone.utc)
+
+    wh_company: Dict[Any, Any] = {
+        w["_id"]: w["company_id"]
+        async for w in db["warehouses"].find({"deleted_at": None}, {"company_id": 1})
+    }
+    if not wh_company:
+        return 0
+
+    due_q = {
+        "warehouse_id": {"$in": list(wh_company)},
+        "expected_at": {"$lt": now},
+    }
+
+    sweep_id = ObjectId()
+    res = await db["supplies"].update_many(
+        {**due_q, "status": "waiting", "overdue_notified_at": None},
+        {"$set": {"overdue_notified_at": now, "overdue_sweep_id": sweep_id}},
+    )
+    if not res.modified_count:
+        return 0
+
+    claimed = [
+        s async for s in db["supplies"].find(
+            {**due_q, "overdue_sweep_id": sweep_id},
+            {"warehouse_id": 1, "item_id": 1, "item_name": 1, "expected_at": 1},
+        )
+    ]
+
+    docs = []
+    for s in claimed:
+        exp = s.get("expected_at")
+        if exp and exp.tzinfo is None:
+            exp = exp.replace(tzinfo=timezone.utc)
+        item_name = s.get("item_name", "—")
+        docs.append(
+            build_notification(
+                company_id=wh_company.get(s["warehouse_id"]),
+                warehouse_id=s["warehouse_id"],
+                supply_id=s["_id"],
+                item_id=s.get("item_id"),
+                ntype="supply_overdue",
+                title="Просроченная поставка",
+                message=f"Поставка «{item_name}» ожидалась {exp.isoformat() if exp else '—'}, статус waiting.",
+                now=now,
+            )
+        )
+
+    return await create_notifications(db, docs)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, List
+
+
+async def _periodic(name: str, interval_sec: float, job: Callable[[], Awaitable[object]], log) -> None:
+    while True:
+        try:
+            result = await job()
+            if result:
+                log.info("[%s] done: %s", name, result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.exception("[%s] failed: %r", name, e)
+        await asyncio.sleep(interval_sec)
+
+
+def start_periodic(app, name: str, interval_sec: float, job: Callable[[], Awaitable[object]]) -> None:
+    """
+    Запускает job каждые interval_sec секунд до остановки приложения.
+    interval_sec <= 0 отключает задачу.
+    """
+    if interval_sec <= 0:
+        app.state.log.info("[%s] disabled", name)
+        return
+    tasks: List[asyncio.Task] = getattr(app.state, "bg_tasks", None) or []
+    tasks.append(asyncio.create_task(_periodic(name, interval_sec, job, app.state.log), name=name))
+    app.state.bg_tasks = tasks
+
+
+async def stop_periodic(app) -> None:
+    tasks: List[asyncio.Task] = getattr(app.state, "bg_tasks", None) or []
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    app.state.bg_tasks = []
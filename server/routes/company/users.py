@@ -3,10 +3,14 @@ from __future__ import annotations
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse
 from datetime import datetime, timezone
+from typing import Any, Dict, List
 
-from server.routes.schemes import CreateEmployee, UpdateEmployeePerms
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from server.routes.schemes import BulkCreateEmployees, CreateEmployee, UpdateEmployeePerms
 from server.core.functions.permissions import require_permission
-from server.core.functions.hash_utils import hash_password
+from server.core.functions.hash_utils import hash_password_async, hash_passwords
 from server.core.db_utils import oid, public_id
 
 router = APIRouter(prefix="/company/users", tags=["Company Users"])
@@ -17,6 +21,22 @@ def _ceo_or_root(current):
         raise HTTPException(403, "Only CEO or root allowed")
 
 
+def _employee_doc(data: CreateEmployee, password_hash: str, company_id) -> Dict[str, Any]:
+    return {
+        "login": data.login,
+        "password": password_hash,
+        "email": data.email,
+        "post": data.post,
+        "permissions": data.permissions,
+        "is_ceo": False,
+        "is_root": False,
+        "company_id": company_id,
+        "created_at": datetime.now(timezone.utc),
+        "blocked_at": None,
+        "deleted_at": None,
+    }
+
+
 @router.post("/create")
 async def create_employee(
     request: Request,
@@ -29,26 +49,76 @@ async def create_employee(
     if current.get("is_root") and not current.get("company_id"):
         raise HTTPException(400, "root has no company context for create")
 
-    if await db["users"].find_one({"login": data.login}):
+    doc = _employee_doc(data, await hash_password_async(data.password), current["company_id"])
+    try:
+        _id = (await db["users"].insert_one(doc)).inserted_id
+    except DuplicateKeyError:
         raise HTTPException(409, "Login exists")
-
-    doc = {
-        "login": data.login,
-        "password": hash_password(data.password),
-        "email": data.email,
-        "post": data.post,
-        "permissions": data.permissions,
-        "is_ceo": False,
-        "is_root": False,
-        "company_id": current["company_id"],
-        "created_at": datetime.now(timezone.utc),
-        "blocked_at": None,
-        "deleted_at": None,
-    }
-    _id = (await db["users"].insert_one(doc)).inserted_id
     return JSONResponse({"ok": True, "user": public_id({**doc, "_id": _id})})
 
 
+@router.post("/create_bulk")
+async def create_employees_bulk(
+    request: Request,
+    data: BulkCreateEmployees,
+    current=require_permission("users.create"),
+):
+    """
+    Массовое создание сотрудников: пароли хешируются параллельно в пуле потоков,
+    занятые логины определяет уникальный индекс login при insert_many(ordered=False).
+    Ошибки возвращаются по индексу строки, остальные сотрудники создаются.
+    """
+    db = request.app.state.mongo_db
+    _ceo_or_root(current)
+
+    if current.get("is_root") and not current.get("company_id"):
+        raise HTTPException(400, "root has no company context for create")
+
+    errors: List[Dict[str, Any]] = []
+    valid: List[tuple] = []
+    seen = set()
+    for i, raw in enumerate(data.users):
+        try:
+            emp = CreateEmployee(**raw)
+        except ValidationError as e:
+            errors.append({
+                "index": i,
+                "login": raw.get("login"),
+                "errors": [
+                    f"{err['loc'][0]}: поле обязательно" if err.get("type") == "missing"
+                    else str(err.get("msg", "")).removeprefix("Value error, ")
+                    for err in e.errors()
+                ],
+            })
+            continue
+        if emp.login in seen:
+            errors.append({"index": i, "login": emp.login, "errors": ["Duplicate login in request"]})
+            continue
+        seen.add(emp.login)
+        valid.append((i, emp))
+
+    hashes = await hash_passwords([emp.password for _, emp in valid])
+    docs = [_employee_doc(emp, h, current["company_id"]) for (_, emp), h in zip(valid, hashes)]
+
+    failed: Dict[int, str] = {}
+    if docs:
+        try:
+            await db["users"].insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for w in e.details.get("writeErrors", []):
+                failed[w["index"]] = "Login exists" if w.get("code") == 11000 else w.get("errmsg", "Insert failed")
+
+    created = []
+    for n, ((i, emp), doc) in enumerate(zip(valid, docs)):
+        if n in failed:
+            errors.append({"index": i, "login": emp.login, "errors": [failed[n]]})
+        else:
+            created.append(public_id({k: v for k, v in doc.items() if k != "password"}))
+
+    errors.sort(key=lambda x: x["index"])
+    return JSONResponse({"ok": True, "created": len(created), "users": created, "errors": errors})
+
+
 @router.get("/list")
 async def list_employees(
     request: Request,
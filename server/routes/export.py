@@ -1,150 +1,159 @@
 from __future__ import annotations
 
-import csv
-import io
-from datetime import datetime, timezone
-from typing import Any, Dict, List
+from typing import Optional
 
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
-from server.core.functions.permissions import require_permission
-from server.core.db_utils import oid
+from server.core.db_utils import oid, public_id
+from server.core.export_jobs import JOBS, job_path, submit_export_job
+from server.core.exports import EXPORT_KINDS, check_format, company_bundle, export_stream
+from server.core.functions.permissions import check_permission, has_perm, require_permission, require_user
+from server.routes.schemes import CreateExportJob
 
 router = APIRouter(prefix="/export", tags=["Export"])
 
 
-def _stream_csv(filename: str, header: List[str], rows: List[List[Any]]):
-    def gen():
-        buf = io.StringIO()
-        writer = csv.writer(buf)
-        writer.writerow(header)
-        yield buf.getvalue()
-        buf.seek(0)
-        buf.truncate(0)
-
-        for r in rows:
-            writer.writerow(r)
-            yield buf.getvalue()
-            buf.seek(0)
-            buf.truncate(0)
-
+def _export_response(db, wh, kind: str, *, fmt: str, gzip: bool):
+    filename, media_type, body = export_stream(db, wh, kind, fmt=fmt, gzip=gzip)
     return StreamingResponse(
-        gen(),
-        media_type="text/csv",
+        body,
+        media_type=media_type,
         headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
-def _iso(dt):
-    if not dt:
-        return ""
-    if isinstance(dt, str):
-        return dt
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(timezone.utc).isoformat()
+def _public_job(job) -> dict:
+    out = public_id({k: v for k, v in job.items() if k != "file"})
+    out["download_url"] = f"/export/jobs/{job['_id']}/download" if job["status"] == "done" else None
+    return out
 
 
-@router.get("/items/{warehouse_id}")
-async def export_items(request: Request, warehouse_id: str, current=require_permission("items.update")):
+async def _warehouse_for_export(request: Request, warehouse_id: str, current):
     db = request.app.state.mongo_db
     wh = await db["warehouses"].find_one({"_id": oid(warehouse_id), "deleted_at": None})
     if not wh:
         raise HTTPException(404, "Склад не найден.")
     if not current.get("is_root") and wh["company_id"] != current["company_id"]:
         raise HTTPException(403, "У вас нет доступа к этой компании.")
+    return db, wh
 
-    rows: List[List[Any]] = []
-    async for i in db["items"].find({"warehouse_id": wh["_id"], "deleted_at": None}):
-        low = i.get("low_limit")
-        if low is None:
-            low = wh.get("low_stock_default", 1)
-        rows.append(
-            [
-                i.get("name"),
-                i.get("category"),
-                i.get("unit"),
-                i.get("count"),
-                low,
-                _iso(i.get("created_at")),
-                _iso(i.get("updated_at")),
-            ]
-        )
-
-    header = ["name", "category", "unit", "count", "low_limit", "created_at", "updated_at"]
-    return _stream_csv(f"items_{warehouse_id}.csv", header, rows)
 
+@router.get("/items/{warehouse_id}")
+async def export_items(
+    request: Request,
+    warehouse_id: str,
+    format: str = "csv",
+    gzip: bool = False,
+    current=require_permission("items.update"),
+):
+    db, wh = await _warehouse_for_export(request, warehouse_id, current)
+    return _export_response(db, wh, "items", fmt=format, gzip=gzip)
 
-@router.get("/supplies/{warehouse_id}")
-async def export_supplies(request: Request, warehouse_id: str, current=require_permission("supplies.update")):
-    db = request.app.state.mongo_db
-    wh = await db["warehouses"].find_one({"_id": oid(warehouse_id), "deleted_at": None})
-    if not wh:
-        raise HTTPException(404, "Склад не найден.")
-    if not current.get("is_root") and wh["company_id"] != current["company_id"]:
-        raise HTTPException(403, "У вас нет доступа к этой компании.")
 
-    supplies = [s async for s in db["supplies"].find({"warehouse_id": wh["_id"]})]
-
-    item_ids = list({s.get("item_id") for s in supplies if s.get("item_id")})
-    items_map: Dict[Any, str] = {}
-    if item_ids:
-        async for it in db["items"].find({"_id": {"$in": item_ids}}):
-            items_map[it["_id"]] = it.get("name", "—")
-
-    now = datetime.now(timezone.utc)
-    rows: List[List[Any]] = []
-    for s in supplies:
-        exp = s.get("expected_at")
-        if exp and exp.tzinfo is None:
-            exp = exp.replace(tzinfo=timezone.utc)
-        overdue = bool(exp and s.get("status") == "waiting" and exp < now)
-        rows.append(
-            [
-                items_map.get(s.get("item_id"), "—"),
-                s.get("amount"),
-                _iso(exp),
-                s.get("status"),
-                s.get("note") or "",
-                "yes" if overdue else "no",
-                _iso(s.get("created_at")),
-                _iso(s.get("updated_at")),
-            ]
-        )
-
-    header = ["item_name", "amount", "expected_at", "status", "note", "overdue", "created_at", "updated_at"]
-    return _stream_csv(f"supplies_{warehouse_id}.csv", header, rows)
+@router.get("/supplies/{warehouse_id}")
+async def export_supplies(
+    request: Request,
+    warehouse_id: str,
+    format: str = "csv",
+    gzip: bool = False,
+    current=require_permission("supplies.update"),
+):
+    db, wh = await _warehouse_for_export(request, warehouse_id, current)
+    return _export_response(db, wh, "supplies", fmt=format, gzip=gzip)
 
 
 @router.get("/history/{warehouse_id}")
-async def export_history(request: Request, warehouse_id: str, current=require_permission("items.update")):
+async def export_history(
+    request: Request,
+    warehouse_id: str,
+    format: str = "csv",
+    gzip: bool = False,
+    current=require_permission("items.update"),
+):
+    db, wh = await _warehouse_for_export(request, warehouse_id, current)
+    return _export_response(db, wh, "history", fmt=format, gzip=gzip)
+
+
+@router.get("/company")
+async def export_company(
+    request: Request,
+    company_id: Optional[str] = None,
+    format: str = "csv",
+    current=require_user(),
+):
+    """Все склады компании одним zip (items / supplies / history — те, на что есть права)."""
     db = request.app.state.mongo_db
-    wh = await db["warehouses"].find_one({"_id": oid(warehouse_id), "deleted_at": None})
-    if not wh:
-        raise HTTPException(404, "Склад не найден.")
-    if not current.get("is_root") and wh["company_id"] != current["company_id"]:
-        raise HTTPException(403, "У вас нет доступа к этой компании.")
-
-    hist = [h async for h in db["history"].find({"warehouse_id": wh["_id"]}).sort("ts", -1)]
-
-    item_ids = list({h.get("item_id") for h in hist if h.get("item_id")})
-    items_map: Dict[Any, str] = {}
-    if item_ids:
-        async for it in db["items"].find({"_id": {"$in": item_ids}}):
-            items_map[it["_id"]] = it.get("name", "—")
-
-    rows = [
-        [
-            items_map.get(h.get("item_id"), "—"),
-            h.get("type"),
-            h.get("amount"),
-            _iso(h.get("ts")),
-            h.get("note") or "",
-            str(h.get("by_user_id") or ""),
-        ]
-        for h in hist
+    if current.get("is_root"):
+        if not company_id:
+            raise HTTPException(400, "Укажите company_id.")
+        try:
+            cid = oid(company_id)
+        except Exception:
+            raise HTTPException(400, "Некорректный company_id.")
+        if not await db["companies"].find_one({"_id": cid, "deleted_at": None}, {"_id": 1}):
+            raise HTTPException(404, "Компания не найдена.")
+    else:
+        cid = current["company_id"]
+        if company_id and company_id != str(cid):
+            raise HTTPException(403, "У вас нет доступа к этой компании.")
+
+    kinds = [kind for kind, (_, _, perm) in EXPORT_KINDS.items() if has_perm(current, perm)]
+    if not kinds:
+        raise HTTPException(403, "Нет прав ни на одну из выгрузок.")
+    check_format(format)
+
+    warehouses = [
+        w async for w in db["warehouses"].find({"company_id": cid, "deleted_at": None}).sort("_id", 1)
     ]
+    if not warehouses:
+        raise HTTPException(404, "У компании нет складов.")
+
+    return StreamingResponse(
+        company_bundle(db, warehouses, kinds, fmt=format),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="company_{cid}.zip"'},
+    )
 
-    header = ["item_name", "type", "amount", "ts", "note", "by_user_id"]
-    return _stream_csv(f"history_{warehouse_id}.csv", header, rows)
\ No newline at end of file
+
+@router.post("/jobs")
+async def create_export_job(request: Request, data: CreateExportJob, current=require_user()):
+    """Фоновая выгрузка: повторный запрос при неизменных данных вернёт ту же задачу (reused)."""
+    check_permission(current, EXPORT_KINDS[data.kind][2])
+    db, wh = await _warehouse_for_export(request, data.warehouse_id, current)
+    job = await submit_export_job(
+        db, wh, data.kind, fmt=data.format, gzip=data.gzip, by_user_id=current["_id"], log=request.app.state.log,
+    )
+    return JSONResponse({"ok": True, "job": _public_job(job)}, status_code=200 if job["reused"] else 202)
+
+
+async def _job_for(request: Request, job_id: str, current):
+    db = request.app.state.mongo_db
+    try:
+        job = await db[JOBS].find_one({"_id": oid(job_id)})
+    except Exception:
+        raise HTTPException(400, "Некорректный job_id.")
+    if not job:
+        raise HTTPException(404, "Выгрузка не найдена.")
+    if not current.get("is_root") and job["company_id"] != current["company_id"]:
+        raise HTTPException(403, "У вас нет доступа к этой компании.")
+    check_permission(current, EXPORT_KINDS[job["kind"]][2])
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def export_job_status(request: Request, job_id: str, current=require_user()):
+    job = await _job_for(request, job_id, current)
+    return JSONResponse({"ok": True, "job": _public_job(job)}, status_code=200)
+
+
+@router.get("/jobs/{job_id}/download")
+async def export_job_download(request: Request, job_id: str, current=require_user()):
+    job = await _job_for(request, job_id, current)
+    if job["status"] != "done":
+        raise HTTPException(409, "Выгрузка ещё не готова.")
+    path = job_path(job)
+    if not path.exists():
+        raise HTTPException(410, "Файл выгрузки уже удалён, запустите выгрузку заново.")
+    # FileResponse отдаёт файл через sendfile и сам обрабатывает Range
+    return FileResponse(path, media_type=job["media_type"], filename=job["filename"])
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import JSONResponse
+
+from server.core.functions.permissions import require_permission
+from server.core.db_utils import oid
+from server.core.db_utils import public_id
+from server.core.history import DAILY, ROLLUP_FIELDS, backfill_history_daily, day_start
+from server.core.snapshots import stock_as_of
+
+QUERY_MAX_LIMIT = 500
+
+router = APIRouter(prefix="/history", tags=["History"])
+
+
+def _ensure_company_access(wh, current):
+    if not current.get("is_root") and wh["company_id"] != current["company_id"]:
+        raise HTTPException(403, "У вас нет доступа к этой компании.")
+
+
+async def _scope_warehouses(db, warehouse_id: Optional[str], current) -> List[Any]:
+    """Один склад (с проверкой доступа) или все склады компании / все склады для root."""
+    if warehouse_id:
+        try:
+            wh = await db["warehouses"].find_one({"_id": oid(warehouse_id), "deleted_at": None})
+        except Exception:
+            raise HTTPException(400, "Некорректный warehouse_id.")
+        if not wh:
+            raise HTTPException(404, "Склад не найден.")
+        _ensure_company_access(wh, current)
+        return [wh["_id"]]
+
+    q: Dict[str, Any] = {"deleted_at": None}
+    if not current.get("is_root"):
+        q["company_id"] = current["company_id"]
+    return [w["_id"] async for w in db["warehouses"].find(q, {"_id": 1})]
+
+
+@router.get("/trend")
+async def stock_trend(
+    request: Request,
+    warehouse_id: Optional[str] = None,
+    item_id: Optional[str] = None,
+    days: int = 30,
+    current=require_permission("items.update"),
+):
+    """Приход / расход / изменения камерой по дням — из дневных сводок history_daily."""
+    if not 1 <= days <= 366:
+        raise HTTPException(400, "days: от 1 до 366.")
+
+    db = request.app.state.mongo_db
+    wh_ids = await _scope_warehouses(db, warehouse_id, current)
+
+    first_day = day_start(datetime.now(timezone.utc)) - timedelta(days=days - 1)
+    match: Dict[str, Any] = {"warehouse_id": {"$in": wh_ids}, "day": {"$gte": first_day}}
+    if item_id:
+        try:
+            match["item_id"] = oid(item_id)
+        except Exception:
+            raise HTTPException(400, "Некорректный item_id.")
+
+    fields = list(ROLLUP_FIELDS.values())
+    per_day: Dict[datetime, Dict[str, int]] = {}
+    if wh_ids:
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": "$day", **{f: {"$sum": f"${f}"} for f in fields}}},
+        ]
+        async for g in db[DAILY].aggregate(pipeline):
+            per_day[day_start(g["_id"])] = {f: int(g.get(f) or 0) for f in fields}
+
+    series = []
+    totals = {f: 0 for f in fields}
+    for i in range(days):
+        day = first_day + timedelta(days=i)
+        row = per_day.get(day, {f: 0 for f in fields})
+        for f in fields:
+            totals[f] += row[f]
+        series.append({"day": day.date().isoformat(), **row})
+
+    return JSONResponse({"ok": True, "days": days, "series": series, "totals": totals})
+
+
+def _encode_cursor(h: Dict[str, Any]) -> str:
+    ts = h["ts"] if h["ts"].tzinfo else h["ts"].replace(tzinfo=timezone.utc)
+    return f"{int(ts.timestamp() * 1000)}_{h['_id']}"
+
+
+def _decode_cursor(cursor: str):
+    try:
+        ms, _id = cursor.split("_", 1)
+        return datetime.fromtimestamp(int(ms) / 1000, tz=timezone.utc), oid(_id)
+    except Exception:
+        raise HTTPException(400, "Некорректный cursor.")
+
+
+@router.get("/query/{warehouse_id}")
+async def query_history(
+    request: Request,
+    warehouse_id: str,
+    type: Optional[str] = None,
+    user_id: Optional[str] = None,
+    item_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    current=require_permission("items.update"),
+):
+    """
+    История склада с фильтрами, от новых к старым.
+    type — один тип или несколько через запятую. Следующая страница — cursor из ответа.
+    """
+    db = request.app.state.mongo_db
+    wh_id = (await _scope_warehouses(db, warehouse_id, current))[0]
+    limit = max(1, min(limit, QUERY_MAX_LIMIT))
+
+    q: Dict[str, Any] = {"warehouse_id": wh_id}
+    if type:
+        types = [t.strip() for t in type.split(",") if t.strip()]
+        q["type"] = types[0] if len(types) == 1 else {"$in": types}
+    try:
+        if user_id:
+            q["by_user_id"] = oid(user_id)
+        if item_id:
+            q["item_id"] = oid(item_id)
+    except Exception:
+        raise HTTPException(400, "Некорректный user_id или item_id.")
+
+    if date_from or date_to:
+        q["ts"] = {}
+        if date_from:
+            q["ts"]["$gte"] = date_from
+        if date_to:
+            q["ts"]["$lte"] = date_to
+
+    if cursor:
+        c_ts, c_id = _decode_cursor(cursor)
+        q["$or"] = [{"ts": {"$lt": c_ts}}, {"ts": c_ts, "_id": {"$lt": c_id}}]
+
+    rows = [
+        h async for h in db["history"]
+        .find(q)
+        .sort([("ts", -1), ("_id", -1)])
+        .limit(limit + 1)
+    ]
+    next_cursor = _encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    hist = [public_id({"item_name": "—", **h}) for h in rows]
+    return JSONResponse({"ok": True, "history": hist, "next_cursor": next_cursor})
+
+
+@router.get("/as_of/{warehouse_id}")
+async def stock_at(
+    request: Request,
+    warehouse_id: str,
+    at: datetime,
+    item_id: Optional[str] = None,
+    current=require_permission("items.update"),
+):
+    """Остатки склада на момент at: ближайший снимок + проигрывание history."""
+    db = request.app.state.mongo_db
+    wh_id = (await _scope_warehouses(db, warehouse_id, current))[0]
+
+    try:
+        item_oid = oid(item_id) if item_id else None
+    except Exception:
+        raise HTTPException(400, "Некорректный item_id.")
+
+    res = await stock_as_of(db, {"_id": wh_id}, at, item_id=item_oid)
+    return JSONResponse({"ok": True, **public_id(res)})
+
+
+@router.post("/rollups/rebuild")
+async def rebuild_rollups(
+    request: Request,
+    since: Optional[datetime] = None,
+    replace: bool = False,
+    current=require_permission("*"),
+):
+    if not current.get("is_root"):
+        raise HTTPException(403, "Доступ только для root пользователя.")
+
+    db = request.app.state.mongo_db
+    await backfill_history_daily(db, since=since, replace=replace)
+    return JSONResponse({"ok": True})
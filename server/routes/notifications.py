@@ -8,9 +8,41 @@ from fastapi.responses import JSONResponse
 
 from server.core.functions.permissions import require_permission
 from server.core.db_utils import oid, public_id
+from server.routes.schemes import ReadNotifications
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
+UNREAD_COUNT_CAP = 999
+
+# Прочитанность — своя у каждого пользователя:
+#  - всё, что последний раз обновлялось (last_at) не позже users.notifications_read_until, прочитано;
+#  - более новые уведомления прочитаны, если пользователь есть в их read_by.
+
+
+def _read_until(current) -> Optional[datetime]:
+    # без отметки считаем прочитанным всё, что было до создания пользователя
+    return current.get("notifications_read_until") or current.get("created_at")
+
+
+def _scope_q(current) -> Dict[str, Any]:
+    if current.get("is_root"):
+        return {}
+    return {"company_id": current["company_id"]}
+
+
+def _unread_q(current) -> Dict[str, Any]:
+    q = {**_scope_q(current), "read_by": {"$ne": current["_id"]}}
+    until = _read_until(current)
+    if until:
+        q["last_at"] = {"$gt": until}
+    return q
+
+
+def _as_utc(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
 
 @router.get("/list")
 async def list_notifications(
@@ -20,17 +52,27 @@ async def list_notifications(
     current=require_permission("warehouses.update"),
 ):
     db = request.app.state.mongo_db
-    q: Dict[str, Any] = {}
-    if not current.get("is_root"):
-        q["company_id"] = current["company_id"]
-    if unread_only:
-        q["read"] = False
-
-    cursor = db["notifications"].find(q).sort("created_at", -1).limit(limit)
-    items = [public_id(x) async for x in cursor]
+    q = _unread_q(current) if unread_only else _scope_q(current)
+    until = _as_utc(_read_until(current))
+
+    items = []
+    cursor = db["notifications"].find(q).sort("last_at", -1).limit(limit)
+    async for x in cursor:
+        read_by = x.pop("read_by", None) or []
+        last_at = _as_utc(x.get("last_at"))
+        x["read"] = bool((until and last_at and last_at <= until) or current["_id"] in read_by)
+        items.append(public_id(x))
     return JSONResponse({"ok": True, "notifications": items})
 
 
+@router.get("/unread_count")
+async def unread_count(request: Request, current=require_permission("warehouses.update")):
+    db = request.app.state.mongo_db
+    # диапазон (company_id, last_at > отметки) берётся из индекса, документы не отдаются
+    count = await db["notifications"].count_documents(_unread_q(current), limit=UNREAD_COUNT_CAP)
+    return JSONResponse({"ok": True, "count": count, "capped": count >= UNREAD_COUNT_CAP})
+
+
 @router.post("/read/{notification_id}")
 async def mark_notification_read(
     request: Request,
@@ -38,15 +80,53 @@ async def mark_notification_read(
     current=require_permission("warehouses.update"),
 ):
     db = request.app.state.mongo_db
-    n = await db["notifications"].find_one({"_id": oid(notification_id)})
+    n = await db["notifications"].find_one({"_id": oid(notification_id)}, {"company_id": 1})
     if not n:
         raise HTTPException(404, "Уведомление не найдено.")
     if not current.get("is_root") and n.get("company_id") != current.get("company_id"):
         raise HTTPException(403, "У вас нет доступа к этой компании.")
 
-    now = datetime.now(timezone.utc)
     await db["notifications"].update_one(
         {"_id": n["_id"]},
-        {"$set": {"read": True, "read_at": now, "read_by_user_id": current["_id"]}},
+        {"$addToSet": {"read_by": current["_id"]}},
     )
-    return JSONResponse({"ok": True})
\ No newline at end of file
+    return JSONResponse({"ok": True})
+
+
+@router.post("/read_bulk")
+async def mark_notifications_read_bulk(
+    request: Request,
+    data: ReadNotifications,
+    current=require_permission("warehouses.update"),
+):
+    """
+    ids — отметить конкретные уведомления (один update_many в рамках компании);
+    until — сдвинуть отметку «прочитано до» (без ids и until — до текущего момента).
+    Пустой список ids ничего не отмечает.
+    """
+    db = request.app.state.mongo_db
+    marked = 0
+
+    if data.ids:
+        try:
+            ids = [oid(x) for x in data.ids]
+        except Exception:
+            raise HTTPException(400, "Некорректный id уведомления.")
+        res = await db["notifications"].update_many(
+            {**_scope_q(current), "_id": {"$in": ids}},
+            {"$addToSet": {"read_by": current["_id"]}},
+        )
+        marked = res.modified_count
+
+    if data.until is not None or data.ids is None:
+        now = datetime.now(timezone.utc)
+        until = min(_as_utc(data.until) or now, now)
+        floor = _as_utc(_read_until(current))
+        if not floor or until > floor:
+            # $max: при гонке двух запросов отметка всё равно только растёт
+            await db["users"].update_one(
+                {"_id": current["_id"]},
+                {"$max": {"notifications_read_until": until}},
+            )
+
+    return JSONResponse({"ok": True, "marked": marked})
@@ -4,6 +4,7 @@ from fastapi.responses import JSONResponse
 from datetime import datetime, timezone
 from server.core.functions.permissions import require_permission
 from server.core.db_utils import oid, public_id
+from server.core.stats import drop_company_stats
 
 router = APIRouter(prefix="/root/companies", tags=["Root"])
 
@@ -55,4 +56,6 @@ async def delete_company(request: Request, company_id: str, current= require_per
         await db["supplies"].update_many({"warehouse_id": {"$in": wh_ids}}, {"$set": {"deleted_at": now}})
         await db["history"].update_many({"warehouse_id": {"$in": wh_ids}}, {"$set": {"deleted_at": now}})
 
+    await drop_company_stats(db, cid)
+
     return JSONResponse({"ok": True})
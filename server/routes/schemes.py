@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 import re
 from pydantic import BaseModel, Field, field_validator
@@ -158,6 +158,20 @@ class CreateEmployee(BaseModel):
         return out
 
 
+class BulkCreateEmployees(BaseModel):
+    # строки проверяются по одной (CreateEmployee), чтобы ошибка в одной не отклоняла весь запрос
+    users: List[Dict[str, Any]]
+
+    @field_validator("users")
+    @classmethod
+    def v_users(cls, v):
+        if not v:
+            raise ValueError("users: должен быть непустой список")
+        if len(v) > 1000:
+            raise ValueError("users: не больше 1000 сотрудников за раз")
+        return v
+
+
 class UpdateEmployeePerms(BaseModel):
     user_id: str
     post: Optional[str] = None
@@ -439,6 +453,85 @@ class UpdateSupplyStatus(BaseModel):
             raise ValueError("status: допустимые значения: waiting, done, canceled")
         return v
 
+class ReceiveSupplyLine(BaseModel):
+    supply_id: str
+    amount: Optional[int] = None
+
+    @field_validator("supply_id")
+    @classmethod
+    def v_supply_id(cls, v):
+        return _validate_str(v, field="supply_id", min_len=1, max_len=128)
+
+    @field_validator("amount")
+    @classmethod
+    def v_amount(cls, v):
+        if v is None:
+            return None
+        return _validate_int(v, field="amount", ge=0)
+
+
+class ReceiveSupplies(BaseModel):
+    warehouse_id: str
+    supplies: List[ReceiveSupplyLine]
+
+    @field_validator("warehouse_id")
+    @classmethod
+    def v_warehouse_id(cls, v):
+        return _validate_str(v, field="warehouse_id", min_len=1, max_len=128)
+
+    @field_validator("supplies")
+    @classmethod
+    def v_supplies(cls, v):
+        if not v:
+            raise ValueError("supplies: должен быть непустой список")
+        if len(v) > 500:
+            raise ValueError("supplies: не больше 500 поставок за раз")
+        ids = [x.supply_id for x in v]
+        if len(set(ids)) != len(ids):
+            raise ValueError("supplies: supply_id не должны повторяться")
+        return v
+
+class ReadNotifications(BaseModel):
+    ids: Optional[List[str]] = None
+    until: Optional[datetime] = None
+
+    @field_validator("ids")
+    @classmethod
+    def v_ids(cls, v):
+        if v is None:
+            return None
+        if len(v) > 1000:
+            raise ValueError("ids: не больше 1000 уведомлений за раз")
+        return list(dict.fromkeys(_validate_str(x, field="ids", min_len=1, max_len=128) for x in v))
+
+
+class CreateExportJob(BaseModel):
+    warehouse_id: str
+    kind: str
+    format: str = "csv"
+    gzip: bool = False
+
+    @field_validator("warehouse_id")
+    @classmethod
+    def v_warehouse_id(cls, v):
+        return _validate_str(v, field="warehouse_id", min_len=1, max_len=128)
+
+    @field_validator("kind")
+    @classmethod
+    def v_kind(cls, v):
+        v = _validate_str(v, field="kind", min_len=1, max_len=20)
+        if v not in {"items", "supplies", "history"}:
+            raise ValueError("kind: допустимые значения: items, supplies, history")
+        return v
+
+    @field_validator("format")
+    @classmethod
+    def v_format(cls, v):
+        v = _validate_str(v, field="format", min_len=1, max_len=20)
+        if v not in {"csv", "parquet", "arrow"}:
+            raise ValueError("format: допустимые значения: csv, parquet, arrow")
+        return v
+
 class CameraAuth(BaseModel):
     company: str
     warehouse_id: str
@@ -477,10 +570,21 @@ class CameraDetectItem(BaseModel):
 
 class CameraDetectPayload(BaseModel):
     detect: List[CameraDetectItem]
+    # рабочая точка клиента (imgsz, пауза инференса, загрузка) — только для диагностики
+    meta: Optional[Dict[str, Any]] = None
 
     @field_validator("detect")
     @classmethod
     def v_detect(cls, v):
         if not isinstance(v, list) or not v:
             raise ValueError("detect: должен быть непустой список")
-        return v
\ No newline at end of file
+        return v
+
+    @field_validator("meta")
+    @classmethod
+    def v_meta(cls, v):
+        if v is None:
+            return None
+        if len(v) > 32:
+            raise ValueError("meta: не больше 32 полей")
+        return v
@@ -6,6 +6,8 @@ from fastapi import APIRouter, Request, HTTPException, status
 from pydantic import BaseModel
 
 from server.core.db_utils import oid
+from server.core.stats import apply_stats_delta, item_stats_delta, merge_delta
+from server.core.history import write_history
 from server.routes.schemes import CameraAuth, CameraDetectPayload
 
 router = APIRouter(tags=["Camera HTTP"])
@@ -54,6 +56,9 @@ async def camera_http(request: Request, data: CameraDetectRequest):
         )
 
     now = datetime.now(timezone.utc)
+    default_low = wh.get("low_stock_default", 1)
+    stats = {}
+    hist = []
 
     for det in payload.detect:
         item = await db["items"].find_one({
@@ -75,9 +80,12 @@ async def camera_http(request: Request, data: CameraDetectRequest):
                 "deleted_at": None
             }
             item_id = (await db["items"].insert_one(item_doc)).inserted_id
+            stats = merge_delta(stats, item_stats_delta(None, item_doc, default_low))
 
-            await db["history"].insert_one({
+            hist.append({
                 "item_id": item_id,
+                "item_name": det.type,
+                "unit": item_doc["unit"],
                 "warehouse_id": wh["_id"],
                 "type": "camera_update",
                 "amount": det.count,
@@ -94,9 +102,12 @@ async def camera_http(request: Request, data: CameraDetectRequest):
                 {"_id": item["_id"]},
                 {"$set": {"count": new_count, "updated_at": now}}
             )
+            stats = merge_delta(stats, item_stats_delta(item, {**item, "count": new_count}, default_low))
 
-            await db["history"].insert_one({
+            hist.append({
                 "item_id": item["_id"],
+                "item_name": item["name"],
+                "unit": item.get("unit"),
                 "warehouse_id": wh["_id"],
                 "type": "camera_update",
                 "amount": new_count - old_count,
@@ -119,6 +130,9 @@ async def camera_http(request: Request, data: CameraDetectRequest):
                     warehouse_name=wh["name"]
                 )
 
+    await write_history(db, hist)
+    await apply_stats_delta(db, wh, stats)
+
     return {
         "ok": True,
         "warehouse": wh["name"],
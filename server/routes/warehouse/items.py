@@ -5,12 +5,16 @@ from typing import Optional, Dict, Any, List
 
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse
+from pymongo import ReturnDocument
 
 from server.routes.schemes import CreateItem, UpdateItem, ItemOp
 from server.core.functions.permissions import require_permission
 from server.core.db_utils import oid, public_id
 from server.core.mailer import send_low_stock_email
 from server.core.notifications import create_notification
+from server.core.stats import apply_stats_delta, item_stats_delta
+from server.core.history import write_history
+from server.core.item_import import IMPORT_MAX_BYTES, import_items
 
 router = APIRouter(prefix="/items", tags=["Items"])
 
@@ -92,9 +96,12 @@ async def create_item(request: Request, data: CreateItem, current=require_permis
     }
     _id = (await db["items"].insert_one(doc)).inserted_id
 
-    await db["history"].insert_one(
+    await write_history(
+        db,
         {
             "item_id": _id,
+            "item_name": data.name,
+            "unit": data.unit,
             "warehouse_id": wh["_id"],
             "type": "income" if data.count > 0 else "create",
             "amount": data.count,
@@ -104,11 +111,45 @@ async def create_item(request: Request, data: CreateItem, current=require_permis
     )
 
     item_doc = {**doc, "_id": _id}
+    await apply_stats_delta(db, wh, item_stats_delta(None, item_doc, wh.get("low_stock_default", 1)))
     await _check_low_stock(db, item_doc, wh, company_id=wh["company_id"], by_user_id=current["_id"])
 
     return JSONResponse({"ok": True, "item": public_id(item_doc)}, status_code=200)
 
 
+@router.post("/import/{warehouse_id}")
+async def import_items_file(
+    request: Request,
+    warehouse_id: str,
+    format: Optional[str] = None,
+    current=require_permission("items.create"),
+):
+    """
+    Тело запроса — сам файл (CSV или XLSX), читается потоком.
+    Колонки: name, category, unit, count, low_limit; ответ — счётчики и ошибки по строкам.
+    """
+    db = request.app.state.mongo_db
+    wh = await db["warehouses"].find_one({"_id": oid(warehouse_id), "deleted_at": None})
+    if not wh:
+        raise HTTPException(404, "Склад не найден.")
+
+    _ensure_company_access(wh, current)
+    _ensure_not_blocked_for_write(wh, current)
+
+    if format is None:
+        ctype = request.headers.get("content-type", "")
+        format = "xlsx" if "spreadsheetml" in ctype else "csv"
+    if format not in {"csv", "xlsx"}:
+        raise HTTPException(400, "Допустимые форматы импорта: csv, xlsx.")
+
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > IMPORT_MAX_BYTES:
+        raise HTTPException(413, f"Файл больше {IMPORT_MAX_BYTES // (1024 * 1024)} МБ.")
+
+    report = await import_items(db, wh, format, request.stream(), by_user_id=current["_id"])
+    return JSONResponse({"ok": True, **report}, status_code=200)
+
+
 @router.get("/list/{warehouse_id}")
 async def list_items(
     request: Request,
@@ -169,9 +210,23 @@ async def update_item(request: Request, data: UpdateItem, current=require_permis
 
     upd = {k: v for k, v in data.model_dump(exclude={"item_id"}).items() if v is not None}
     upd["updated_at"] = datetime.now(timezone.utc)
-    await db["items"].update_one({"_id": item["_id"]}, {"$set": upd})
+    before = await db["items"].find_one_and_update({"_id": item["_id"]}, {"$set": upd})
+    if not before:
+        raise HTTPException(404, "Товар не найден.")
+
+    item2 = {**before, **upd}
+    renamed = {
+        k: item2.get(src)
+        for k, src in (("item_name", "name"), ("unit", "unit"))
+        if item2.get(src) != before.get(src)
+    }
+    if renamed:
+        # имя и единица денормализованы в history и supplies; updated_at меняет версию выгрузок
+        renamed["updated_at"] = upd["updated_at"]
+        await db["history"].update_many({"item_id": item["_id"]}, {"$set": renamed})
+        await db["supplies"].update_many({"item_id": item["_id"]}, {"$set": renamed})
 
-    item2 = await db["items"].find_one({"_id": item["_id"]})
+    await apply_stats_delta(db, wh, item_stats_delta(before, item2, wh.get("low_stock_default", 1)))
     await _check_low_stock(db, item2, wh, company_id=wh["company_id"], by_user_id=current["_id"])
 
     return JSONResponse({"ok": True}, status_code=200)
@@ -192,13 +247,17 @@ async def income(request: Request, data: ItemOp, current=require_permission("ite
     _ensure_not_blocked_for_write(wh, current)
 
     now = datetime.now(timezone.utc)
-    await db["items"].update_one(
+    item2 = await db["items"].find_one_and_update(
         {"_id": item["_id"]},
         {"$inc": {"count": data.amount}, "$set": {"updated_at": now}},
+        return_document=ReturnDocument.AFTER,
     )
-    await db["history"].insert_one(
+    await write_history(
+        db,
         {
             "item_id": item["_id"],
+            "item_name": item2["name"],
+            "unit": item2.get("unit"),
             "warehouse_id": wh["_id"],
             "type": "income",
             "amount": data.amount,
@@ -207,7 +266,8 @@ async def income(request: Request, data: ItemOp, current=require_permission("ite
         }
     )
 
-    item2 = await db["items"].find_one({"_id": item["_id"]})
+    before = {**item2, "count": item2["count"] - (data.amount)}
+    await apply_stats_delta(db, wh, item_stats_delta(before, item2, wh.get("low_stock_default", 1)))
     await _check_low_stock(db, item2, wh, company_id=wh["company_id"], by_user_id=current["_id"])
 
     return JSONResponse({"ok": True, "count": item2["count"]}, status_code=200)
@@ -231,13 +291,17 @@ async def outcome(request: Request, data: ItemOp, current=require_permission("it
         raise HTTPException(400, "Недостаточно товара на складе.")
 
     now = datetime.now(timezone.utc)
-    await db["items"].update_one(
+    item2 = await db["items"].find_one_and_update(
         {"_id": item["_id"]},
         {"$inc": {"count": -data.amount}, "$set": {"updated_at": now}},
+        return_document=ReturnDocument.AFTER,
     )
-    await db["history"].insert_one(
+    await write_history(
+        db,
         {
             "item_id": item["_id"],
+            "item_name": item2["name"],
+            "unit": item2.get("unit"),
             "warehouse_id": wh["_id"],
             "type": "outcome",
             "amount": data.amount,
@@ -246,7 +310,8 @@ async def outcome(request: Request, data: ItemOp, current=require_permission("it
         }
     )
 
-    item2 = await db["items"].find_one({"_id": item["_id"]})
+    before = {**item2, "count": item2["count"] - (-data.amount)}
+    await apply_stats_delta(db, wh, item_stats_delta(before, item2, wh.get("low_stock_default", 1)))
     await _check_low_stock(db, item2, wh, company_id=wh["company_id"], by_user_id=current["_id"])
 
     return JSONResponse({"ok": True, "count": item2["count"]}, status_code=200)
@@ -286,23 +351,13 @@ async def warehouse_history(
 
     _ensure_company_access(wh, current)
 
-    hist_raw = [
-        h async for h in db["history"]
+    hist = [
+        public_id({"item_name": "—", **h})
+        async for h in db["history"]
         .find({"warehouse_id": wh["_id"]})
         .sort("ts", -1)
         .limit(limit)
     ]
-
-    item_ids = list({h.get("item_id") for h in hist_raw if h.get("item_id")})
-    items_map: Dict[Any, str] = {}
-    if item_ids:
-        async for it in db["items"].find({"_id": {"$in": item_ids}}):
-            items_map[it["_id"]] = it.get("name", "—")
-
-    hist = [
-        public_id({**h, "item_name": items_map.get(h.get("item_id"), "—")})
-        for h in hist_raw
-    ]
     return JSONResponse({"ok": True, "history": hist}, status_code=200)
 
 
@@ -8,6 +8,7 @@ import secrets
 from server.routes.schemes import CreateWarehouse, UpdateWarehouse
 from server.core.functions.permissions import require_permission
 from server.core.db_utils import oid, public_id
+from server.core.stats import drop_warehouse_stats, rebuild_warehouse_stats
 
 router = APIRouter(prefix="/warehouse", tags=["Warehouse"])
 
@@ -84,6 +85,10 @@ async def update_warehouse(
     if upd:
         await db["warehouses"].update_one({"_id": wh["_id"]}, {"$set": upd})
 
+    if "low_stock_default" in upd and upd["low_stock_default"] != wh.get("low_stock_default"):
+        # порог склада меняет low у всех товаров без своего low_limit
+        await rebuild_warehouse_stats(db, {**wh, **upd})
+
     return JSONResponse({"ok": True})
 
 
@@ -105,6 +110,7 @@ async def delete_warehouse(
         {"_id": wh["_id"]},
         {"$set": {"deleted_at": datetime.now(timezone.utc)}},
     )
+    await drop_warehouse_stats(db, wh)
     return JSONResponse({"ok": True})
 
 
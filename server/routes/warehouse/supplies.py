@@ -1,15 +1,20 @@
 from __future__ import annotations
 
+import re
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 
+from bson import ObjectId
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse
+from pymongo import UpdateOne
 
-from server.routes.schemes import CreateSupply, UpdateSupplyStatus
+from server.routes.schemes import CreateSupply, UpdateSupplyStatus, ReceiveSupplies
 from server.core.functions.permissions import require_permission
 from server.core.db_utils import oid, public_id
 from server.core.notifications import create_notification
+from server.core.stats import apply_stats_delta, item_stats_delta, merge_delta, supply_stats_delta
+from server.core.history import write_history
 
 router = APIRouter(prefix="/supplies", tags=["Supplies"])
 
@@ -46,6 +51,8 @@ async def create_supply(
     doc = {
         "warehouse_id": wh["_id"],
         "item_id": item["_id"],
+        "item_name": item["name"],
+        "unit": item.get("unit"),
         "amount": data.amount,
         "expected_at": data.expected_at,
         "note": data.note,
@@ -55,6 +62,7 @@ async def create_supply(
         "updated_at": now,
     }
     _id = (await db["supplies"].insert_one(doc)).inserted_id
+    await apply_stats_delta(db, wh, supply_stats_delta(None, "waiting"))
 
     await create_notification(
         db,
@@ -69,7 +77,7 @@ async def create_supply(
     )
 
     return JSONResponse(
-        {"ok": True, "supply": public_id({**doc, "_id": _id, "item_name": item.get("name")})}
+        {"ok": True, "supply": public_id({**doc, "_id": _id})}
     )
 
 
@@ -79,6 +87,8 @@ async def list_supplies(
     warehouse_id: str,
     status: Optional[str] = None,
     search: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     sort: str = "expected_at",
     order: int = 1,
     current=require_permission("supplies.update"),
@@ -94,52 +104,194 @@ async def list_supplies(
     if status and status != "all":
         q["status"] = status
 
-    cursor = db["supplies"].find(q)
-    if sort in {"expected_at", "created_at", "updated_at", "amount", "status"}:
-        cursor = cursor.sort(sort, order)
+    if date_from or date_to:
+        q["expected_at"] = {}
+        if date_from:
+            q["expected_at"]["$gte"] = date_from
+        if date_to:
+            q["expected_at"]["$lte"] = date_to
 
-    supplies_raw = [s async for s in cursor]
+    if search:
+        # сначала товары склада с подходящим именем (их немного), потом только их поставки
+        # по индексу (warehouse_id, item_id, expected_at); item_name поставки — только для ответа
+        name_q = {"warehouse_id": wh["_id"], "name": {"$regex": re.escape(search), "$options": "i"}}
+        item_ids = [it["_id"] async for it in db["items"].find(name_q, {"_id": 1})]
+        if not item_ids:
+            return JSONResponse({"ok": True, "supplies": []})
+        q["item_id"] = {"$in": item_ids}
 
-    item_ids = list({s.get("item_id") for s in supplies_raw if s.get("item_id")})
-    items_map: Dict[Any, Dict[str, Any]] = {}
-    if item_ids:
-        async for it in db["items"].find({"_id": {"$in": item_ids}}):
-            items_map[it["_id"]] = it
+    cursor = db["supplies"].find(q)
+    if sort in {"expected_at", "created_at", "updated_at", "amount", "status", "item_name"}:
+        direction = -1 if order < 0 else 1
+        cursor = cursor.sort([(sort, direction), ("_id", direction)])
 
     now = datetime.now(timezone.utc)
     out: List[Dict[str, Any]] = []
 
-    for s in supplies_raw:
-        item_doc = items_map.get(s.get("item_id"))
-        item_name = item_doc.get("name") if item_doc else "—"
-
+    async for s in cursor:
         exp = s.get("expected_at")
         if exp and exp.tzinfo is None:
             exp = exp.replace(tzinfo=timezone.utc)
 
         overdue = bool(exp and s.get("status") == "waiting" and exp < now)
+        out.append(public_id({"item_name": "—", **s, "overdue": overdue}))
 
-        if overdue and not s.get("overdue_notified_at"):
-            await db["supplies"].update_one({"_id": s["_id"]}, {"$set": {"overdue_notified_at": now}})
-            await create_notification(
-                db,
-                company_id=wh["company_id"],
-                warehouse_id=wh["_id"],
-                supply_id=s["_id"],
-                item_id=s.get("item_id"),
-                ntype="supply_overdue",
-                title="Просроченная поставка",
-                message=f"Поставка «{item_name}» ожидалась {exp.isoformat() if exp else '—'}, статус waiting.",
-            )
+    return JSONResponse({"ok": True, "supplies": out})
 
-        doc = {**s, "item_name": item_name, "overdue": overdue}
-        out.append(public_id(doc))
 
-    if search:
-        sl = search.lower()
-        out = [x for x in out if sl in (x.get("item_name") or "").lower()]
+async def _receive_supplies(
+    db,
+    wh: Dict[str, Any],
+    lines: List[Tuple[ObjectId, Optional[int]]],
+    *,
+    by_user_id,
+    from_status: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """
+    Переводит поставки в done и приходует товар.
+
+    Поставка забирается условным update (status из from_status), поэтому
+    повторный приём той же поставки ничего не меняет: остаток увеличивается
+    ровно один раз. Остатки и история пишутся пачками.
+    """
+    now = datetime.now(timezone.utc)
+    receipt_id = ObjectId()
+
+    ops = [
+        UpdateOne(
+            {"_id": sid, "warehouse_id": wh["_id"], "status": from_status},
+            [
+                {
+                    "$set": {
+                        "status": "done",
+                        "updated_at": now,
+                        "received_at": now,
+                        "receipt_id": receipt_id,
+                        "received_from": "$status",
+                        "received_amount": amount if amount is not None else "$amount",
+                    }
+                }
+            ],
+        )
+        for sid, amount in lines
+    ]
+    res = await db["supplies"].bulk_write(ops, ordered=False)
+    if not res.modified_count:
+        return []
+
+    claimed = [
+        s async for s in db["supplies"].find(
+            {"_id": {"$in": [sid for sid, _ in lines]}, "receipt_id": receipt_id},
+            {"item_id": 1, "item_name": 1, "unit": 1, "received_amount": 1, "received_from": 1},
+        )
+    ]
+
+    per_item: Dict[Any, int] = {}
+    stats: Dict[str, int] = {}
+    for s in claimed:
+        per_item[s["item_id"]] = per_item.get(s["item_id"], 0) + int(s["received_amount"])
+        stats = merge_delta(stats, supply_stats_delta(s.get("received_from"), "done"))
+
+    default_low = wh.get("low_stock_default", 1)
+    async for it in db["items"].find({"_id": {"$in": list(per_item)}, "deleted_at": None}):
+        after = {**it, "count": int(it.get("count", 0)) + per_item[it["_id"]]}
+        stats = merge_delta(stats, item_stats_delta(it, after, default_low))
+
+    item_ops = [
+        UpdateOne({"_id": item_id}, {"$inc": {"count": amount}, "$set": {"updated_at": now}})
+        for item_id, amount in per_item.items()
+        if amount
+    ]
+    if item_ops:
+        await db["items"].bulk_write(item_ops, ordered=False)
+    await apply_stats_delta(db, wh, stats)
+
+    await write_history(
+        db,
+        [
+            {
+                "item_id": s["item_id"],
+                "item_name": s.get("item_name", "—"),
+                "unit": s.get("unit"),
+                "warehouse_id": wh["_id"],
+                "type": "income",
+                "amount": int(s["received_amount"]),
+                "ts": now,
+                "by_user_id": by_user_id,
+                "note": "auto from supply",
+                "supply_id": s["_id"],
+            }
+            for s in claimed
+        ]
+    )
 
-    return JSONResponse({"ok": True, "supplies": out})
+    return claimed
+
+
+@router.post("/receive")
+async def receive_supplies(
+    request: Request,
+    data: ReceiveSupplies,
+    current=require_permission("supplies.update"),
+):
+    db = request.app.state.mongo_db
+    wh = await db["warehouses"].find_one({"_id": oid(data.warehouse_id), "deleted_at": None})
+    if not wh:
+        raise HTTPException(404, "Склад не найден.")
+
+    _ensure_company_access(wh, current)
+    _ensure_not_blocked_for_write(wh, current)
+
+    try:
+        lines = [(oid(x.supply_id), x.amount) for x in data.supplies]
+    except Exception:
+        raise HTTPException(400, "Некорректный supply_id.")
+
+    claimed = await _receive_supplies(
+        db, wh, lines, by_user_id=current["_id"], from_status="waiting"
+    )
+    claimed_ids = {s["_id"] for s in claimed}
+
+    skipped: List[Dict[str, Any]] = []
+    rest = [sid for sid, _ in lines if sid not in claimed_ids]
+    if rest:
+        found = {
+            s["_id"]: s.get("status")
+            async for s in db["supplies"].find(
+                {"_id": {"$in": rest}, "warehouse_id": wh["_id"]}, {"status": 1}
+            )
+        }
+        for sid in rest:
+            st = found.get(sid)
+            reason = "not_found" if st is None else "already_done" if st == "done" else st
+            skipped.append({"supply_id": str(sid), "reason": reason})
+
+    if claimed:
+        total = sum(int(s["received_amount"]) for s in claimed)
+        await create_notification(
+            db,
+            company_id=wh["company_id"],
+            warehouse_id=wh["_id"],
+            ntype="supply_received",
+            title="Поставки приняты",
+            message=f"На склад «{wh['name']}» принято поставок: {len(claimed)}, единиц товара: {total}.",
+            by_user_id=current["_id"],
+        )
+
+    return JSONResponse(
+        {
+            "ok": True,
+            "received": [
+                {
+                    "supply_id": str(s["_id"]),
+                    "item_id": str(s["item_id"]),
+                    "amount": int(s["received_amount"]),
+                }
+                for s in claimed
+            ],
+            "skipped": skipped,
+        }
+    )
 
 
 @router.post("/status")
@@ -160,31 +312,28 @@ async def update_supply_status(
     _ensure_company_access(wh, current)
     _ensure_not_blocked_for_write(wh, current)
 
-    now = datetime.now(timezone.utc)
-    await db["supplies"].update_one(
-        {"_id": sup["_id"]},
-        {"$set": {"status": data.status, "updated_at": now}},
-    )
-
-    item = await db["items"].find_one({"_id": sup["item_id"]})
-    item_name = item.get("name") if item else "—"
+    if sup.get("status") == "done":
+        if data.status == "done":
+            return JSONResponse({"ok": True})
+        raise HTTPException(409, "Поставка уже принята, статус изменить нельзя.")
 
     if data.status == "done":
-        await db["items"].update_one(
-            {"_id": sup["item_id"]},
-            {"$inc": {"count": sup["amount"]}, "$set": {"updated_at": now}},
+        claimed = await _receive_supplies(
+            db, wh, [(sup["_id"], None)], by_user_id=current["_id"], from_status={"$ne": "done"}
         )
-        await db["history"].insert_one(
-            {
-                "item_id": sup["item_id"],
-                "warehouse_id": sup["warehouse_id"],
-                "type": "income",
-                "amount": sup["amount"],
-                "ts": now,
-                "by_user_id": current["_id"],
-                "note": "auto from supply",
-            }
+        if not claimed:
+            # параллельный запрос успел принять поставку раньше
+            return JSONResponse({"ok": True})
+    else:
+        prev = await db["supplies"].find_one_and_update(
+            {"_id": sup["_id"], "status": {"$ne": "done"}},
+            {"$set": {"status": data.status, "updated_at": datetime.now(timezone.utc)}},
+            {"status": 1},
         )
+        if prev:
+            await apply_stats_delta(db, wh, supply_stats_delta(prev.get("status"), data.status))
+
+    item_name = sup.get("item_name", "—")
 
     await create_notification(
         db,
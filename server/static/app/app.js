@@ -1228,13 +1228,12 @@ let lastNotifCount = 0;
 async function loadNotificationsCount(showToastOnNew=false){
   if(!API.token()) return;
   try{
-    const data = await API.req("/notifications/list?unread_only=true&limit=200");
-    notificationsCache = data.notifications || [];
-    const count = notificationsCache.length;
+    const data = await API.req("/notifications/unread_count");
+    const count = data.count || 0;
 
     const elCount = $("#notifsCount");
     if (elCount){
-      elCount.textContent = String(count);
+      elCount.textContent = data.capped ? `${count}+` : String(count);
       elCount.classList.toggle("hidden", count === 0);
     }
 
@@ -1251,7 +1250,13 @@ async function loadNotificationsCount(showToastOnNew=false){
 }
 
 async function openNotifications(){
-  await loadNotificationsCount(false);
+  try{
+    const data = await API.req("/notifications/list?limit=50");
+    notificationsCache = data.notifications || [];
+  }catch(e){
+    toast(e.message,"bad");
+    return;
+  }
   const list = notificationsCache;
 
   modal.open({
@@ -1259,16 +1264,30 @@ async function openNotifications(){
     bodyHTML: list.length ? list.map(n=>`
       <div class="notif-item ${n.read ? "" : "unread"}" data-id="${n.id}">
         <div class="row">
-          <div style="font-weight:700">${escapeHtml(n.title||"—")}</div>
-          <div class="muted" style="font-size:12px">${new Date(n.created_at).toLocaleString()}</div>
+          <div style="font-weight:700">${escapeHtml(n.title||"—")}${n.count > 1 ? ` <span class="badge">×${n.count}</span>` : ""}</div>
+          <div class="muted" style="font-size:12px">${new Date(n.last_at || n.created_at).toLocaleString()}</div>
         </div>
         <div class="muted">${escapeHtml(n.message||"")}</div>
         ${n.type ? `<div class="mono muted" style="font-size:11px">${escapeHtml(n.type)}</div>`:""}
       </div>
     `).join("") : `<div class="muted">Пока пусто 🙂</div>`,
-    footerHTML:`<button class="btn btn-ghost" id="mOk">Закрыть</button>`,
+    footerHTML:`
+      ${list.some(n=>!n.read) ? `<button class="btn" id="mReadAll">Прочитать все</button>` : ""}
+      <button class="btn btn-ghost" id="mOk">Закрыть</button>
+    `,
     onMount: (el)=>{
       $("#mOk").onclick = modal.close;
+      const readAll = $("#mReadAll");
+      if (readAll) readAll.onclick = async ()=>{
+        try{
+          await API.req("/notifications/read_bulk", {method:"POST", body:{}});
+          el.querySelectorAll(".notif-item.unread").forEach(card=>card.classList.remove("unread"));
+          readAll.remove();
+          await loadNotificationsCount(false);
+        }catch(e){
+          toast(e.message,"bad");
+        }
+      };
       el.querySelectorAll(".notif-item.unread").forEach(card=>{
         card.onclick = async ()=>{
           const id = card.dataset.id;
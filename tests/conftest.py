@@ -1,7 +1,22 @@
+import os
 import sys
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT))
-load_dotenv()
\ No newline at end of file
+load_dotenv()
+
+# обязательные настройки для импорта server без .env (юнит-тесты не ходят ни в Mongo, ни наружу)
+for _key, _value in {
+    "DATA_ROOT": tempfile.mkdtemp(prefix="wh-tests-"),
+    "WEATHER_API_KEY": "test",
+    "ROOT_USER_LOGIN": "root",
+    "ROOT_USER_PASSWORD": "password123",
+    "JWT_SECRET_KEY": "test-secret-key-0123456789abcdef0123",
+    "MONGO_URL": "mongodb://localhost:27017/test",
+    "POSTGRES_URL": "postgresql://u:p@localhost:5432/test",
+    "MYSQL_URL": "mysql://u:p@localhost:3306/test",
+}.items():
+    os.environ.setdefault(_key, _value)
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from server.core.cache import TTLCache
+
+
+class Counter:
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("boom")
+        return self.calls
+
+
+async def test_fresh_hit():
+    cache = TTLCache(ttl=60)
+    compute = Counter()
+    assert await cache.get("k", compute) == 1
+    assert await cache.get("k", compute) == 1
+    assert compute.calls == 1
+    assert cache.metrics["hits"] == 1
+
+
+async def test_concurrent_misses_coalesce():
+    cache = TTLCache(ttl=60)
+    compute = Counter(delay=0.01)
+    results = await asyncio.gather(*(cache.get("k", compute) for _ in range(20)))
+    assert results == [1] * 20
+    assert cache.metrics["recomputes"] == 1
+    assert cache.metrics["coalesced"] == 19
+
+
+async def test_concurrent_stale_requests_refresh_once():
+    cache = TTLCache(ttl=0.05, stale_ttl=60)
+    compute = Counter(delay=0.01)
+    await cache.get("k", compute)
+    await asyncio.sleep(0.06)
+
+    results = await asyncio.gather(*(cache.get("k", compute) for _ in range(20)))
+    assert results == [1] * 20
+    assert cache.metrics["stale"] == 20
+    assert cache.metrics["recomputes"] == 2
+
+    await asyncio.sleep(0.02)
+    assert cache.snapshot()["inflight"] == 0
+    assert await cache.get("k", compute) == 2
+
+
+async def test_cancelled_caller_does_not_fail_waiters():
+    cache = TTLCache(ttl=60)
+    compute = Counter(delay=0.05)
+    first = asyncio.create_task(cache.get("k", compute))
+    await asyncio.sleep(0)
+    others = [asyncio.create_task(cache.get("k", compute)) for _ in range(5)]
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await asyncio.gather(*others) == [1] * 5
+    assert compute.calls == 1
+    assert await cache.get("k", compute) == 1
+
+
+async def test_error_propagates_and_is_not_cached():
+    cache = TTLCache(ttl=60)
+    failing = Counter(delay=0.01, fail=True)
+    results = await asyncio.gather(*(cache.get("k", failing) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert failing.calls == 1
+    assert cache.metrics["errors"] == 1
+
+    assert await cache.get("k", Counter()) == 1
+    assert cache.snapshot()["inflight"] == 0
+
+
+async def test_stale_refresh_error_keeps_stale_value():
+    cache = TTLCache(ttl=0.01, stale_ttl=60)
+    await cache.get("k", Counter())
+    await asyncio.sleep(0.02)
+
+    assert await cache.get("k", Counter(fail=True)) == 1
+    await asyncio.sleep(0.01)
+    assert cache.metrics["errors"] == 1
+    assert await cache.get("k", Counter()) == 1
+
+
+async def test_disabled_cache_always_computes():
+    cache = TTLCache(ttl=0)
+    compute = Counter()
+    await cache.get("k", compute)
+    await cache.get("k", compute)
+    assert compute.calls == 2
+
+
+async def test_eviction_respects_max_entries():
+    cache = TTLCache(ttl=60, max_entries=2)
+    for k in "abc":
+        await cache.get(k, Counter())
+    assert cache.snapshot()["entries"] == 2
@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+from server.core import item_import
+from server.core.item_import import _limited, csv_records
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+async def _records(data: bytes, size: int = 7, report=None):
+    report = report if report is not None else {"truncated": False}
+    return [r async for r in csv_records(_limited(_chunks(data, size), report), report)], report
+
+
+async def test_quoted_newlines_and_delimiter():
+    data = 'name;count\n"Multi\nline; ""q""";3\nApple;5\n'.encode()
+    records, _ = await _records(data, size=3)
+    assert records == [["name", "count"], ['Multi\nline; "q"', "3"], ["Apple", "5"]]
+
+
+async def test_last_record_without_newline():
+    records, _ = await _records(b"name,count\nApple,5")
+    assert records[-1] == ["Apple", "5"]
+
+
+async def test_truncated_body_drops_partial_record(monkeypatch):
+    data = b"name,count\napple,7\nbanana,123456\n"
+    monkeypatch.setattr(item_import, "IMPORT_MAX_BYTES", data.index(b"3456"))
+    records, report = await _records(data, size=4)
+    assert report["truncated"] is True
+    assert records == [["name", "count"], ["apple", "7"]]
+
+
+class _Items:
+    def __init__(self, docs):
+        self.docs = docs
+        self.ops = []
+
+    async def _iter(self, docs):
+        for d in docs:
+            yield d
+
+    def find(self, q):
+        return self._iter([d for d in self.docs if d["name"] in q["name"]["$in"]])
+
+    async def bulk_write(self, ops, ordered=True):
+        self.ops.extend(ops)
+        return SimpleNamespace(upserted_ids={})
+
+
+class _Coll:
+    def __init__(self):
+        self.updates = []
+
+    async def update_many(self, q, u):
+        self.updates.append((q, u))
+
+
+async def _noop(*args, **kwargs):
+    pass
+
+
+async def test_existing_item_keeps_fields_missing_from_file(monkeypatch):
+    item = {
+        "_id": ObjectId(), "warehouse_id": "w", "name": "Apple", "category": "fruit", "unit": "кг",
+        "count": 5, "low_limit": 3, "low_notified_at": None, "deleted_at": None,
+    }
+    items, history, supplies = _Items([item]), _Coll(), _Coll()
+    db = {"items": items, "history": history, "supplies": supplies}
+    hist = []
+    monkeypatch.setattr(item_import, "write_history", lambda db, rows: _noop(hist.extend(rows)))
+    monkeypatch.setattr(item_import, "apply_stats_delta", _noop)
+    monkeypatch.setattr(item_import, "create_notifications", _noop)
+
+    wh = {"_id": "w", "company_id": "c", "name": "W", "low_stock_default": 1}
+    report = await item_import.import_items(db, wh, "csv", _chunks(b"name,count\nApple,8\n", 64), by_user_id=None)
+
+    assert report["updated"] == 1
+    (op,) = items.ops
+    assert op._doc["$set"]["count"] == 8
+    assert not {"category", "unit", "low_limit"} & set(op._doc["$set"])
+    assert {"category", "unit", "low_limit"} <= set(op._doc["$setOnInsert"])
+    assert history.updates == [] and supplies.updates == []
+    assert [(h["unit"], h["amount"]) for h in hist] == [("кг", 3)]
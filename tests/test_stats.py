@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+
+from server.core.stats import (
+    SUPPLY_STATUSES,
+    _flat,
+    _unflat,
+    decode_category,
+    encode_category,
+    item_stats_delta,
+    merge_delta,
+    supply_stats_delta,
+)
+
+
+def _item(count, low_limit=None, category="food", deleted_at=None):
+    return {"count": count, "low_limit": low_limit, "category": category, "deleted_at": deleted_at}
+
+
+def test_create_item():
+    assert item_stats_delta(None, _item(5), default_low=1) == {"items": 1, "stock": 5, "categories.food": 1}
+    assert item_stats_delta(None, _item(1), default_low=1) == {"items": 1, "stock": 1, "low": 1, "categories.food": 1}
+
+
+def test_outcome_below_limit_becomes_low():
+    assert item_stats_delta(_item(5, low_limit=3), _item(3, low_limit=3)) == {"stock": -2, "low": 1}
+
+
+def test_income_above_limit_leaves_low():
+    assert item_stats_delta(_item(3, low_limit=3), _item(10, low_limit=3)) == {"stock": 7, "low": -1}
+
+
+def test_low_limit_change_without_count_change():
+    assert item_stats_delta(_item(4, low_limit=2), _item(4, low_limit=5)) == {"low": 1}
+    assert item_stats_delta(_item(4, low_limit=5), _item(4, low_limit=None), default_low=1) == {"low": -1}
+
+
+def test_warehouse_default_threshold():
+    assert item_stats_delta(None, _item(2), default_low=2)["low"] == 1
+    assert "low" not in item_stats_delta(None, _item(2), default_low=1)
+
+
+def test_category_change():
+    assert item_stats_delta(_item(4, category="food"), _item(4, category="toys")) == {
+        "categories.food": -1,
+        "categories.toys": 1,
+    }
+
+
+def test_missing_category_counts_as_other():
+    assert item_stats_delta(None, _item(4, category=None))["categories.other"] == 1
+
+
+def test_deleted_item_on_either_side():
+    now = datetime.now(timezone.utc)
+    removed = item_stats_delta(_item(2, low_limit=3), _item(2, low_limit=3, deleted_at=now))
+    assert removed == {"items": -1, "stock": -2, "low": -1, "categories.food": -1}
+    assert item_stats_delta(_item(2, deleted_at=now), _item(9, deleted_at=now)) == {}
+    assert item_stats_delta(_item(2, deleted_at=now), _item(2)) == {"items": 1, "stock": 2, "categories.food": 1}
+
+
+def test_unchanged_item_has_empty_delta():
+    assert item_stats_delta(_item(4, low_limit=5), _item(4, low_limit=5)) == {}
+
+
+def test_supply_transitions():
+    assert supply_stats_delta(None, "waiting") == {"supplies.waiting": 1}
+    assert supply_stats_delta("waiting", "done") == {"supplies.waiting": -1, "supplies.done": 1}
+    assert supply_stats_delta("canceled", "done") == {"supplies.canceled": -1, "supplies.done": 1}
+    assert supply_stats_delta("done", "done") == {}
+    assert supply_stats_delta("waiting", "bogus") == {"supplies.waiting": -1}
+
+
+def test_merge_delta_drops_zeros():
+    acc = merge_delta({}, {"items": 1, "stock": 5, "low": 1})
+    acc = merge_delta(acc, {"stock": 2, "low": -1})
+    assert acc == {"items": 1, "stock": 7}
+
+
+def test_category_key_round_trip():
+    for name in ("a.b", "$money", "100%", "%2E", "x.$.%", "обычная"):
+        key = encode_category(name)
+        assert "." not in key and not key.startswith("$")
+        assert decode_category(key) == name
+    assert encode_category("%2E") != encode_category(".")
+
+
+def test_flat_unflat_round_trip():
+    flat = {"items": 3, "stock": 12, "low": 1, f"categories.{encode_category('a.b')}": 3, "supplies.done": 2}
+    doc = _unflat(flat)
+    assert doc["categories"] == {encode_category("a.b"): 3}
+    assert set(doc["supplies"]) == set(SUPPLY_STATUSES)
+    assert _flat(doc) == flat
+    assert _flat(None) == {}
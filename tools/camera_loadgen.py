@@ -0,0 +1,295 @@
+"""
+Нагрузочный генератор для POST /camera.
+
+Симулирует N камер с правдоподобно меняющимися счётчиками против локального
+сервера и локального mongod, ступенчато наращивает число камер и пишет
+машиночитаемый отчёт: p50/p99 задержки, долю ошибок и число операций Mongo
+на один приём.
+
+    python tools/camera_loadgen.py --ramp 1,10,50,100 --stage-sec 30 \
+        --server http://127.0.0.1:9105 --mongo mongodb://localhost:27017/hackathon_db
+
+Склады и компания создаются напрямую в Mongo и удаляются после прогона
+(если не указан --keep). opcounters — счётчики всего mongod, поэтому
+цифры на ингест честные только на выделенном локальном инстансе.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import httpx
+from pymongo import MongoClient
+
+OPS_FIELDS = ("insert", "query", "update", "delete", "getmore")
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+class Stage:
+    def __init__(self, cameras: int):
+        self.cameras = cameras
+        self.latencies_ms: List[float] = []
+        self.ok = 0
+        self.errors = 0
+        self.status_counts: Dict[str, int] = {}
+        self.started = 0.0
+        self.finished = 0.0
+        self.ops_before: Dict[str, int] = {}
+        self.ops_after: Dict[str, int] = {}
+
+    def record(self, latency_ms: float, status: str):
+        self.latencies_ms.append(latency_ms)
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        if status == "200":
+            self.ok += 1
+        else:
+            self.errors += 1
+
+    def report(self) -> Dict[str, Any]:
+        duration = max(self.finished - self.started, 1e-9)
+        total = self.ok + self.errors
+        ops = {f: self.ops_after.get(f, 0) - self.ops_before.get(f, 0) for f in OPS_FIELDS}
+        ops_total = sum(ops.values())
+        return {
+            "cameras": self.cameras,
+            "duration_sec": round(duration, 2),
+            "requests": total,
+            "ok": self.ok,
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "rps": round(total / duration, 2),
+            "status_counts": self.status_counts,
+            "latency_ms": {
+                "p50": round(_percentile(self.latencies_ms, 50), 2),
+                "p90": round(_percentile(self.latencies_ms, 90), 2),
+                "p99": round(_percentile(self.latencies_ms, 99), 2),
+                "max": round(max(self.latencies_ms), 2) if self.latencies_ms else 0.0,
+            },
+            "mongo_ops": ops,
+            "mongo_ops_per_ingest": round(ops_total / self.ok, 2) if self.ok else None,
+        }
+
+
+class SimCamera:
+    """Камера над полкой: несколько типов товаров, счётчики блуждают на ±1..3."""
+
+    def __init__(self, company: str, warehouse_id: str, api_key: str, types: int, rnd: random.Random):
+        self.auth = {"company": company, "warehouse_id": warehouse_id, "api_key": api_key}
+        self.rnd = rnd
+        self.counts = {f"loadgen-item-{i + 1}": rnd.randint(5, 40) for i in range(types)}
+
+    def step(self, change_prob: float) -> Dict[str, Any]:
+        for name in self.counts:
+            if self.rnd.random() < change_prob:
+                self.counts[name] = max(0, self.counts[name] + self.rnd.choice((-3, -2, -1, 1, 2, 3)))
+        detect = [{"type": k, "count": v} for k, v in self.counts.items()]
+        return {"auth": self.auth, "payload": {"detect": detect}}
+
+
+def _opcounters(mongo: MongoClient) -> Dict[str, int]:
+    return dict(mongo.admin.command("serverStatus")["opcounters"])
+
+
+def seed(db, cameras: int, run_id: str) -> Dict[str, Any]:
+    now = datetime.now(timezone.utc)
+    company_name = f"loadgen-{run_id}"
+    company_id = db["companies"].insert_one(
+        {
+            "name": company_name,
+            "inn": None,
+            "email": "loadgen@localhost",
+            "created_at": now,
+            "blocked_at": None,
+            "deleted_at": None,
+        }
+    ).inserted_id
+
+    warehouses = []
+    for i in range(cameras):
+        doc = {
+            "company_id": company_id,
+            "name": f"loadgen-{run_id}-{i + 1}",
+            # без email и с нулевым порогом — прогон не рассылает low-stock письма
+            "notification_emails": [],
+            "low_stock_default": 0,
+            "camera_api_key": secrets.token_urlsafe(24),
+            "created_at": now,
+            "blocked_at": None,
+            "deleted_at": None,
+        }
+        doc["_id"] = db["warehouses"].insert_one(doc).inserted_id
+        warehouses.append(doc)
+
+    return {"company_id": company_id, "company_name": company_name, "warehouses": warehouses}
+
+
+def _drop_stats(db, company_id):
+    # как drop_company_stats на сервере: счётчики компании вычитаются из глобального документа
+    old = db["company_stats"].find_one_and_delete({"_id": f"company:{company_id}"}) or {}
+    db["company_stats"].delete_many({"scope": "warehouse", "company_id": company_id})
+    diff = {k: -int(old.get(k, 0)) for k in ("items", "stock", "low") if old.get(k)}
+    for group in ("categories", "supplies"):
+        for k, v in (old.get(group) or {}).items():
+            if v:
+                diff[f"{group}.{k}"] = -int(v)
+    if diff:
+        db["company_stats"].update_one({"_id": "global"}, {"$inc": diff})
+
+
+def cleanup(db, fixture: Dict[str, Any]):
+    wh_ids = [w["_id"] for w in fixture["warehouses"]]
+    for coll in ("items", "history", "history_daily", "stock_snapshots", "supplies", "notifications"):
+        db[coll].delete_many({"warehouse_id": {"$in": wh_ids}})
+    _drop_stats(db, fixture["company_id"])
+    db["warehouses"].delete_many({"_id": {"$in": wh_ids}})
+    db["companies"].delete_one({"_id": fixture["company_id"]})
+
+
+async def camera_loop(
+    client: httpx.AsyncClient,
+    endpoint: str,
+    cam: SimCamera,
+    stages: List[Stage],
+    state: Dict[str, Any],
+    interval: float,
+    change_prob: float,
+    rnd: random.Random,
+):
+    # разнесённый старт, чтобы камеры не били залпом
+    await asyncio.sleep(rnd.uniform(0, interval))
+    while not state["stop"]:
+        stage = stages[state["stage"]]
+        body = cam.step(change_prob)
+        t0 = time.perf_counter()
+        try:
+            resp = await client.post(endpoint, json=body)
+            status = str(resp.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        latency_ms = (time.perf_counter() - t0) * 1000.0
+        # ответы, пришедшие после закрытия ступени, в её статистику не попадают
+        if not state["stop"] and not stage.finished:
+            stage.record(latency_ms, status)
+        await asyncio.sleep(max(0.0, interval * rnd.uniform(0.9, 1.1) - latency_ms / 1000.0))
+
+
+async def run(args) -> Dict[str, Any]:
+    ramp = sorted({int(x) for x in args.ramp.split(",") if x.strip()})
+    if not ramp or ramp[0] <= 0:
+        raise SystemExit("--ramp: нужен список положительных чисел, например 1,10,50")
+
+    mongo = MongoClient(args.mongo, serverSelectionTimeoutMS=5000)
+    db = mongo[args.db] if args.db else mongo.get_default_database()
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    fixture = seed(db, ramp[-1], run_id)
+    rnd = random.Random(args.seed)
+
+    cams = [
+        SimCamera(fixture["company_name"], str(w["_id"]), w["camera_api_key"], args.types, rnd)
+        for w in fixture["warehouses"]
+    ]
+
+    stages = [Stage(n) for n in ramp]
+    state: Dict[str, Any] = {"stage": 0, "stop": False}
+    endpoint = f"{args.server.rstrip('/')}/camera"
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+
+    tasks: List[asyncio.Task] = []
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            for idx, stage in enumerate(stages):
+                state["stage"] = idx
+                while len(tasks) < stage.cameras:
+                    cam = cams[len(tasks)]
+                    tasks.append(asyncio.create_task(
+                        camera_loop(client, endpoint, cam, stages, state, args.interval, args.change_prob, rnd)
+                    ))
+
+                # первые запросы новых камер создают товары — их не меряем
+                await asyncio.sleep(min(args.interval * 1.5, args.stage_sec / 4))
+                stage.latencies_ms.clear()
+                stage.ok = stage.errors = 0
+                stage.status_counts.clear()
+
+                stage.ops_before = await asyncio.to_thread(_opcounters, mongo)
+                stage.started = time.perf_counter()
+                await asyncio.sleep(args.stage_sec)
+                stage.finished = time.perf_counter()
+                stage.ops_after = await asyncio.to_thread(_opcounters, mongo)
+
+                rep = stage.report()
+                print(
+                    f"[LOADGEN] cameras={rep['cameras']:>4}  rps={rep['rps']:>7}  "
+                    f"p50={rep['latency_ms']['p50']:>7}ms  p99={rep['latency_ms']['p99']:>7}ms  "
+                    f"errors={rep['error_rate']:.2%}  mongo_ops/ingest={rep['mongo_ops_per_ingest']}"
+                )
+
+            state["stop"] = True
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        state["stop"] = True
+        for t in tasks:
+            t.cancel()
+        if not args.keep:
+            cleanup(db, fixture)
+        mongo.close()
+
+    return {
+        "started_at": run_id,
+        "server": args.server,
+        "config": {
+            "ramp": ramp,
+            "stage_sec": args.stage_sec,
+            "interval_sec": args.interval,
+            "types_per_camera": args.types,
+            "change_prob": args.change_prob,
+        },
+        "stages": [s.report() for s in stages],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for POST /camera")
+    parser.add_argument("--server", default=os.getenv("LOADGEN_SERVER", "http://127.0.0.1:9105"))
+    parser.add_argument("--mongo", default=os.getenv("MONGO_URL", "mongodb://localhost:27017/hackathon_db"))
+    parser.add_argument("--db", help="имя базы, если его нет в --mongo")
+    parser.add_argument("--ramp", default="1,5,10,25,50", help="число камер на ступенях, через запятую")
+    parser.add_argument("--stage-sec", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=1.0, help="период отправки одной камеры, как SEND_INTERVAL_SEC")
+    parser.add_argument("--types", type=int, default=3, help="типов товаров в кадре одной камеры")
+    parser.add_argument("--change-prob", type=float, default=0.3, help="вероятность изменения счётчика за тик")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", default="loadgen_report.json")
+    parser.add_argument("--keep", action="store_true", help="не удалять тестовые данные после прогона")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"[LOADGEN] report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()